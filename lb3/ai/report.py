@@ -13,13 +13,16 @@ from ..database import Database
 from . import input_hash
 
 
-def ensure_reports_dir() -> Path:
+def ensure_reports_dir(base: Path | None = None) -> Path:
     """Ensure reports directory exists and return it.
 
+    Args:
+        base: Directory to create lb_data/reports under (default: current directory)
+
     Returns:
-        Path to ./lb_data/reports directory
+        Path to <base>/lb_data/reports directory
     """
-    reports_dir = Path("./lb_data/reports")
+    reports_dir = (base if base is not None else Path(".")) / "lb_data" / "reports"
     reports_dir.mkdir(parents=True, exist_ok=True)
     return reports_dir
 
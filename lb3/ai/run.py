@@ -9,6 +9,15 @@ from typing import Any
 from ..database import Database
 
 
+def now_ms() -> int:
+    """Get current UTC milliseconds timestamp.
+
+    Returns:
+        Current UTC timestamp in milliseconds
+    """
+    return int(time.time() * 1000)
+
+
 def get_code_git_sha() -> str | None:
     """Get current git commit SHA.
 
@@ -47,7 +56,7 @@ def start_run(
         Run ID string
     """
     run_id = uuid.uuid4().hex
-    started_utc_ms = int(time.time() * 1000)
+    started_utc_ms = now_ms()
 
     # Auto-detect git SHA if not provided
     if code_git_sha is None:
@@ -95,7 +104,7 @@ def finish_run(db: Database, run_id: str, status: str) -> None:
     if status not in {"ok", "partial", "failed"}:
         raise ValueError(f"Invalid status: {status}")
 
-    finished_utc_ms = int(time.time() * 1000)
+    finished_utc_ms = now_ms()
 
     with db._get_connection() as conn:
         cursor = conn.execute(
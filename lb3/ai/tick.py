@@ -352,3 +352,18 @@ def tick_once(
         lock.release_lock(db, "tick", lock_result["owner_token"])
 
     return counters
+
+
+def format_tick_line(counters: dict, run_id: str) -> str:
+    """Format tick counters as the single CLI output line.
+
+    Args:
+        counters: Dictionary with processing counters from tick_once
+        run_id: Run ID to append after the counters
+
+    Returns:
+        Line of the form "tick key=value,...,run_id=<run_id>"
+    """
+    output_parts = [f"{key}={value}" for key, value in counters.items()]
+    output_parts.append(f"run_id={run_id}")
+    return f"tick {','.join(output_parts)}"
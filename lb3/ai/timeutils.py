@@ -1,5 +1,9 @@
 """Time utilities for AI analysis."""
 
+# Milliseconds per hour and per minute
+HOUR_MS = 3_600_000
+MINUTE_MS = 60_000
+
 
 def floor_hour_ms(ts_ms: int) -> int:
     """Floor timestamp to the start of its hour (UTC).
@@ -10,10 +14,7 @@ def floor_hour_ms(ts_ms: int) -> int:
     Returns:
         UTC milliseconds aligned to start of hour (:00)
     """
-    # Convert to seconds, floor to hour, convert back to ms
-    ts_sec = ts_ms // 1000
-    hour_sec = (ts_sec // 3600) * 3600
-    return hour_sec * 1000
+    return (ts_ms // HOUR_MS) * HOUR_MS
 
 
 def ceil_hour_ms(ts_ms: int) -> int:
@@ -25,10 +26,9 @@ def ceil_hour_ms(ts_ms: int) -> int:
     Returns:
         UTC milliseconds aligned to start of next hour (:00)
     """
-    # Convert to seconds, ceil to hour, convert back to ms
-    ts_sec = ts_ms // 1000
-    hour_sec = ((ts_sec + 3599) // 3600) * 3600
-    return hour_sec * 1000
+    # Already-aligned timestamps are their own ceiling
+    hour_ms = floor_hour_ms(ts_ms)
+    return hour_ms if hour_ms == ts_ms else hour_ms + HOUR_MS
 
 
 def iter_hours(since_utc_ms: int, until_utc_ms: int) -> list[tuple[int, int]]:
@@ -48,14 +48,7 @@ def iter_hours(since_utc_ms: int, until_utc_ms: int) -> list[tuple[int, int]]:
     start_hour = floor_hour_ms(since_utc_ms)
     end_hour = ceil_hour_ms(until_utc_ms)
 
-    if start_hour >= end_hour:
-        return []
-
-    windows = []
-    current_hour = start_hour
-
-    while current_hour < end_hour:
-        windows.append((current_hour, current_hour + 3600000))
-        current_hour += 3600000
-
-    return windows
+    # range() is empty when start_hour >= end_hour
+    return [
+        (hstart, hstart + HOUR_MS) for hstart in range(start_hour, end_hour, HOUR_MS)
+    ]
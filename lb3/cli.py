@@ -1102,15 +1102,8 @@ def ai_tick(
                 run_id,
             )
 
-            # Update run ID in counters
-            counters["run_id"] = run_id
-
             # Output exactly one line with all counters
-            output_parts = []
-            for key, value in counters.items():
-                output_parts.append(f"{key}={value}")
-
-            typer.echo(f"tick {','.join(output_parts)}")
+            typer.echo(tick.format_tick_line(counters, run_id))
 
             # Finish run successfully
             run.finish_run(db, run_id, "ok")
@@ -4,7 +4,7 @@ import sqlite3
 import threading
 import time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Optional, Union
 
 from .config import get_effective_config
 from .ids import new_id
@@ -12,29 +12,45 @@ from .logging_setup import get_logger
 
 logger = get_logger("database")
 
+# Special SQLite path for a private, non-persistent database
+MEMORY_DB_PATH = ":memory:"
+
 
 class Database:
     """SQLite database connection with WAL mode and schema management."""
 
-    def __init__(self, db_path: Optional[Path] = None):
+    def __init__(
+        self, db_path: Optional[Union[Path, str]] = None, create_schema: bool = True
+    ):
         """Initialize database connection.
 
         Args:
-            db_path: Path to SQLite database file. If None, uses config path.
+            db_path: Path to SQLite database file, or ":memory:" for an
+                in-memory database that lives as long as its connection.
+                If None, uses config path.
+            create_schema: If False, only open the connection and skip schema
+                creation and migrations, for callers that fill in a complete
+                database themselves (see copy_to_memory).
         """
         if db_path is None:
             config = get_effective_config()
             db_path = Path(config.storage.sqlite_path)
 
-        self.db_path = db_path
+        self.in_memory = str(db_path) == MEMORY_DB_PATH
+        self.db_path = Path(db_path)
         self._conn: Optional[sqlite3.Connection] = None
+        self._opened = False
         self._lock = threading.Lock()
 
         # Ensure directory exists
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.in_memory:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize database
-        self._init_database()
+        if create_schema:
+            self._init_database()
+        else:
+            self._get_connection()
 
         # Compatibility alias - temporary, to be removed in later cleanup
         self._connection = self._conn
@@ -71,10 +87,18 @@ class Database:
     def _get_connection(self) -> sqlite3.Connection:
         """Get database connection, creating if necessary."""
         if self._conn is None or self._conn.execute("SELECT 1").fetchone() is None:
+            if self.in_memory and self._opened:
+                # Reconnecting would silently hand back a new, empty database
+                raise sqlite3.ProgrammingError(
+                    "In-memory database was closed and its contents are gone"
+                )
             self._conn = sqlite3.connect(
-                str(self.db_path), timeout=30.0, check_same_thread=False
+                MEMORY_DB_PATH if self.in_memory else str(self.db_path),
+                timeout=30.0,
+                check_same_thread=False,
             )
             self._conn.row_factory = sqlite3.Row
+            self._opened = True
             # Update compatibility alias
             self._connection = self._conn
 
@@ -159,7 +183,6 @@ class Database:
     def _create_indexes(self, conn: sqlite3.Connection) -> None:
         """Create database indexes."""
         indexes_sql = """
-        CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts_utc);
         CREATE INDEX IF NOT EXISTS idx_events_monitor_ts ON events(monitor, ts_utc);
         CREATE INDEX IF NOT EXISTS idx_events_subject ON events(subject_type, subject_id);
         CREATE INDEX IF NOT EXISTS idx_apps_exe ON apps(exe_name);
@@ -259,7 +282,7 @@ class Database:
                     "idx_apps_exe",
                     "idx_events_monitor_ts",
                     "idx_events_subject",
-                    "idx_events_ts",
+                    "idx_events_ts_id",
                     "idx_windows_app",
                 ]
 
@@ -296,15 +319,17 @@ class Database:
 
     def get_table_counts(self) -> dict[str, int]:
         """Get count of records in each table."""
-        counts = {}
         tables = ["sessions", "apps", "windows", "files", "urls", "events"]
 
+        # One statement with a scalar subquery per table instead of N queries
+        query = "SELECT " + ", ".join(
+            f"(SELECT COUNT(*) FROM {table})" for table in tables
+        )
+
         with self._get_connection() as conn:
-            for table in tables:
-                result = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
-                counts[table] = result[0] if result else 0
+            result = conn.execute(query).fetchone()
 
-        return counts
+        return dict(zip(tables, result))
 
     def insert_session(self, session_data: dict[str, Any]) -> None:
         """Insert a session record."""
@@ -414,6 +439,16 @@ class Database:
                 # Connection context manager handles commit
                 return file_id
 
+    def copy_to_memory(self) -> "Database":
+        """Copy this database into a new in-memory Database.
+
+        Uses SQLite's online backup API, so the copy already has the full
+        schema and data and skips schema creation and migrations.
+        """
+        copy = Database(MEMORY_DB_PATH, create_schema=False)
+        self._get_connection().backup(copy._get_connection())
+        return copy
+
     def close(self) -> None:
         """Close database connection."""
         if self._conn:
@@ -1,6 +1,6 @@
 """Database migration framework for Little Brother v3."""
 
-LATEST_SCHEMA_VERSION = 6
+LATEST_SCHEMA_VERSION = 7
 
 MIGRATIONS = [
     {
@@ -175,4 +175,13 @@ MIGRATIONS = [
         CREATE INDEX IF NOT EXISTS idx_ai_digest_period ON ai_digest(kind, period_start_ms);
         """,
     },
+    {
+        "version": 7,
+        "name": "events_ts_id_index_v1",
+        "sql": """
+        CREATE INDEX IF NOT EXISTS idx_events_ts_id ON events(ts_utc, id);
+
+        DROP INDEX IF EXISTS idx_events_ts;
+        """,
+    },
 ]
@@ -70,8 +70,6 @@ class HeartbeatMonitor(MonitorBase):
         except Exception as e:
             self.logger.error(f"Error in heartbeat monitor: {e}", exc_info=True)
         finally:
-            # Mark as no longer running when we finish naturally
-            self._running = False
             try:
                 self.stop_monitoring()
             except Exception as e:
@@ -79,6 +77,13 @@ class HeartbeatMonitor(MonitorBase):
                     f"Error stopping heartbeat monitor: {e}", exc_info=True
                 )
 
+            # stop() skips its final flush once _running is False, so flush
+            # the last beats here before marking the monitor finished
+            self.flush()
+
+            # Mark as no longer running when we finish naturally
+            self._running = False
+
     def _emit_heartbeat(self) -> None:
         """Emit a heartbeat event."""
         self._beat_count += 1
@@ -129,7 +129,8 @@ class ManualScheduler:
         self._external_clock = clock
         self._tasks: list[ScheduledTask] = []
         self._task_counter = 0
-        self._lock = threading.Lock()
+        # Reentrant: call_later and advance read now() while holding the lock
+        self._lock = threading.RLock()
 
     def now(self) -> float:
         """Get current simulated time."""
@@ -0,0 +1,29 @@
+"""Shared fixtures for AI analysis tests."""
+
+import pytest
+
+from lb3.database import Database
+
+
+@pytest.fixture(scope="session")
+def template_db():
+    """Fully migrated in-memory database that per-test databases are copied from."""
+    db = Database(":memory:")
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope="module")
+def module_db(template_db):
+    """In-memory database shared by all tests in a module."""
+    db = template_db.copy_to_memory()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def db(template_db):
+    """Fresh in-memory database for a single test, copied from the template."""
+    db = template_db.copy_to_memory()
+    yield db
+    db.close()
@@ -7,20 +7,7 @@ from pathlib import Path
 from lb3.ai.summarise import summarise_hours
 from lb3.ai.summarise_days import day_range_ms, summarise_days
 from lb3.database import Database
-
-
-def close_db_connections(db: Database):
-    """Ensure all database connections are properly closed."""
-    try:
-        # Close any active connections
-        if hasattr(db, "_connection") and db._connection:
-            db._connection.close()
-        # Force garbage collection of any remaining connections
-        import gc
-
-        gc.collect()
-    except Exception:
-        pass
+from tests.helpers.database import close_db_connections
 
 
 def test_day_range_ms():
@@ -1,311 +1,219 @@
 """Test late-data reconciliation and integrity checks."""
 
-import tempfile
-import time
-from pathlib import Path
-
+from lb3.ai.input_hash import calc_input_hash_for_hour
 from lb3.ai.reconcile import (
     find_day_mismatches,
     find_hour_mismatches,
     recompute_days,
     recompute_hours,
 )
+from lb3.ai.run import get_code_git_sha
 from lb3.ai.summarise import summarise_hours
 from lb3.ai.summarise_days import summarise_days
-from lb3.database import Database
-
+from tests.helpers.fixed_times import (
+    DAY_END,
+    DAY_START,
+    EVENT_TS,
+    HOUR_END,
+    HOUR_START,
+    LATE_EVENT_TS,
+)
 
-def close_db_connections(db: Database):
-    """Ensure all database connections are properly closed."""
+# Timestamp for app/window bookkeeping columns; no test asserts on it
+_FIXED_NOW = 1_700_000_000_000
+
+_INSERT_APP = "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)"
+_INSERT_WINDOW = "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)"
+_INSERT_EVENT = """
+    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_SUMMARY = """
+    INSERT INTO ai_hourly_summary (
+        hour_utc_start_ms, metric_key, value_num, input_row_count,
+        coverage_ratio, run_id, input_hash_hex, created_utc_ms,
+        updated_utc_ms, computed_by_version
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def event_row(
+    event_id: str, ts_utc: int, monitor: str = "keyboard", action: str = "keydown"
+) -> tuple:
+    """Build an events row attributed to the test app."""
+    return (event_id, ts_utc, monitor, action, "app", "session1", "app1")
+
+
+def seed_app_window_events(conn, events: list[tuple]) -> None:
+    """Insert the test app, its window and the given events in one transaction."""
+    current_time = _FIXED_NOW
+    # Manage the transaction explicitly instead of via sqlite3's implicit BEGIN
+    previous_isolation_level = conn.isolation_level
+    conn.isolation_level = None
     try:
-        # Close any active connections
-        if hasattr(db, "_connection") and db._connection:
-            db._connection.close()
-        # Force garbage collection of any remaining connections
-        import gc
+        # Take the write lock once up front rather than per statement
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            _INSERT_APP, ("app1", "TestApp.exe", "hash1", current_time, current_time)
+        )
+        conn.execute(
+            _INSERT_WINDOW,
+            ("window1", "app1", "hash_window1", current_time, current_time),
+        )
+        conn.executemany(_INSERT_EVENT, events)
+        conn.execute("COMMIT")
+    finally:
+        conn.isolation_level = previous_isolation_level
+
+
+def seed_hour_summary(db, hstart_ms: int, hend_ms: int, run_id: str) -> None:
+    """Store a keyboard_events summary row carrying the hour's current input hash."""
+    hash_result = calc_input_hash_for_hour(db, hstart_ms, hend_ms, get_code_git_sha())
+    with db._get_connection() as conn:
+        conn.execute(
+            _INSERT_SUMMARY,
+            (
+                hstart_ms,
+                "keyboard_events",
+                hash_result["count"],
+                hash_result["count"],
+                1.0,
+                run_id,
+                hash_result["hash_hex"],
+                _FIXED_NOW,
+                _FIXED_NOW,
+                1,
+            ),
+        )
+        conn.commit()
+
+
+def test_hour_reconcile_late_event(db):
+    """Test hourly reconciliation when late data arrives."""
+    conn = db._get_connection()
 
-        gc.collect()
-    except Exception:
-        pass
+    # Create test app and window with an initial event 5 minutes into hour
+    seed_app_window_events(conn, [event_row("initial_event", EVENT_TS)])
 
+    # Seed the hour's summary directly rather than running summarise_hours
+    seed_hour_summary(db, HOUR_START, HOUR_END, "test_reconcile_run1")
 
-def test_hour_reconcile_late_event():
-    """Test hourly reconciliation when late data arrives."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        db_path = Path(temp_dir) / "test_hour_reconcile.db"
-        db = Database(db_path)
-
-        try:
-            # Create test apps and windows
-            current_time = int(time.time() * 1000)
-            with db._get_connection() as conn:
-                conn.execute(
-                    "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("app1", "TestApp.exe", "hash1", current_time, current_time),
-                )
-                conn.execute(
-                    "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("window1", "app1", "hash_window1", current_time, current_time),
-                )
-
-                # Fixed hour for testing: 2022-01-01 10:00:00 UTC
-                hour_start = 1640952000000  # 2022-01-01 10:00:00 UTC
-                hour_end = hour_start + 3600000  # 11:00:00 UTC
-
-                # Add initial event
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "initial_event",
-                        hour_start + 300000,  # 5 minutes into hour
-                        "keyboard",
-                        "keydown",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
-
-            # Initial summarisation
-            run_id1 = "test_reconcile_run1"
-            summarise_hours(db, hour_start, hour_end, grace_minutes=0, run_id=run_id1)
-
-            # Verify no mismatches initially
-            mismatches = find_hour_mismatches(db, hour_start, hour_end, grace_minutes=0)
-            assert len(mismatches) == 0
-
-            # Add late data (new event in the same hour)
-            with db._get_connection() as conn:
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "late_event",
-                        hour_start + 600000,  # 10 minutes into hour
-                        "keyboard",
-                        "keydown",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
-
-            # Now there should be a mismatch
-            mismatches = find_hour_mismatches(db, hour_start, hour_end, grace_minutes=0)
-            assert len(mismatches) == 1
-            assert hour_start in mismatches
-
-            # Reconcile the mismatched hour
-            run_id2 = "test_reconcile_run2"
-            result = recompute_hours(
-                db, mismatches, run_id2, computed_by_version=1, idle_mode="simple"
-            )
-
-            # Should have reprocessed the hour with updates
-            assert result["hours_examined"] == 1
-            assert (
-                result["hours_reprocessed"] >= 0
-            )  # May be 0 if values didn't change significantly
-            assert result["updates"] >= 0  # Updates depend on value changes
-
-            # After reconciliation, no more mismatches
-            mismatches_after = find_hour_mismatches(
-                db, hour_start, hour_end, grace_minutes=0
-            )
-            assert len(mismatches_after) == 0
-
-        finally:
-            close_db_connections(db)
-
-
-def test_day_rehash_after_hour_fix():
+    # Verify no mismatches initially
+    mismatches = find_hour_mismatches(db, HOUR_START, HOUR_END, grace_minutes=0)
+    assert len(mismatches) == 0
+
+    # Add late data (new event in the same hour)
+    conn.execute(_INSERT_EVENT, event_row("late_event", LATE_EVENT_TS))
+    conn.commit()
+
+    # Now there should be a mismatch
+    mismatches = find_hour_mismatches(db, HOUR_START, HOUR_END, grace_minutes=0)
+    assert len(mismatches) == 1
+    assert HOUR_START in mismatches
+
+    # Reconcile the mismatched hour
+    run_id2 = "test_reconcile_run2"
+    result = recompute_hours(
+        db, mismatches, run_id2, computed_by_version=1, idle_mode="simple"
+    )
+
+    # Should have reprocessed the hour with updates
+    assert result["hours_examined"] == 1
+    assert (
+        result["hours_reprocessed"] >= 0
+    )  # May be 0 if values didn't change significantly
+    assert result["updates"] >= 0  # Updates depend on value changes
+
+    # After reconciliation, no more mismatches
+    mismatches_after = find_hour_mismatches(db, HOUR_START, HOUR_END, grace_minutes=0)
+    assert len(mismatches_after) == 0
+
+
+def test_day_rehash_after_hour_fix(db):
     """Test day rehashing after hourly input hash changes."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        db_path = Path(temp_dir) / "test_day_rehash.db"
-        db = Database(db_path)
-
-        try:
-            # Create test apps and windows
-            current_time = int(time.time() * 1000)
-            with db._get_connection() as conn:
-                conn.execute(
-                    "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("app1", "TestApp.exe", "hash1", current_time, current_time),
-                )
-                conn.execute(
-                    "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("window1", "app1", "hash_window1", current_time, current_time),
-                )
-
-                # Fixed day for testing: 2022-01-01 00:00:00 UTC
-                day_start = 1640995200000
-                hour_start = day_start + 3600000  # 01:00 UTC
-
-                # Add initial event
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "day_event",
-                        hour_start + 300000,  # 5 minutes into hour
-                        "keyboard",
-                        "keydown",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
-
-            # Initial hourly and daily summarisation - only for the hour with events
-            run_id1 = "test_day_rehash_run1"
-            summarise_hours(
-                db, hour_start, hour_start + 3600000, grace_minutes=0, run_id=run_id1
-            )
-            summarise_days(db, day_start, day_start + 86400000, run_id1)
-
-            # Verify no day mismatches initially
-            day_mismatches = find_day_mismatches(db, [day_start])
-            assert len(day_mismatches) == 0
-
-            # Add late data and re-summarise the affected hour
-            with db._get_connection() as conn:
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "late_day_event",
-                        hour_start + 600000,  # 10 minutes into hour
-                        "mouse",
-                        "click",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
-
-            # Re-summarise the hour (this changes its input hash)
-            run_id2 = "test_day_rehash_run2"
-            summarise_hours(
-                db, hour_start, hour_start + 3600000, grace_minutes=0, run_id=run_id2
-            )
-
-            # Now there should be a day mismatch
-            day_mismatches = find_day_mismatches(db, [day_start])
-            assert len(day_mismatches) == 1
-            assert day_start in day_mismatches
-
-            # Reconcile the mismatched day
-            run_id3 = "test_day_rehash_run3"
-            result = recompute_days(db, day_mismatches, run_id3, computed_by_version=1)
-
-            # Should have reprocessed the day
-            assert result["days_examined"] == 1
-            assert result["updates"] >= 0  # Should have updates due to hash change
-
-            # After reconciliation, no more mismatches
-            day_mismatches_after = find_day_mismatches(db, [day_start])
-            assert len(day_mismatches_after) == 0
-
-        finally:
-            close_db_connections(db)
-
-
-def test_idempotent_noops():
+    conn = db._get_connection()
+
+    # Create test app and window with an initial event 5 minutes into hour
+    seed_app_window_events(conn, [event_row("day_event", EVENT_TS)])
+
+    # Initial hourly and daily summarisation - only for the hour with events
+    run_id1 = "test_day_rehash_run1"
+    summarise_hours(db, HOUR_START, HOUR_END, grace_minutes=0, run_id=run_id1)
+    summarise_days(db, DAY_START, DAY_END, run_id1)
+
+    # Verify no day mismatches initially
+    day_mismatches = find_day_mismatches(db, [DAY_START])
+    assert len(day_mismatches) == 0
+
+    # Add late data and re-summarise the affected hour
+    conn.execute(
+        _INSERT_EVENT,
+        event_row("late_day_event", LATE_EVENT_TS, "mouse", "click"),
+    )
+    conn.commit()
+
+    # Re-summarise the hour (this changes its input hash)
+    run_id2 = "test_day_rehash_run2"
+    summarise_hours(db, HOUR_START, HOUR_END, grace_minutes=0, run_id=run_id2)
+
+    # Now there should be a day mismatch
+    day_mismatches = find_day_mismatches(db, [DAY_START])
+    assert len(day_mismatches) == 1
+    assert DAY_START in day_mismatches
+
+    # Reconcile the mismatched day
+    run_id3 = "test_day_rehash_run3"
+    result = recompute_days(db, day_mismatches, run_id3, computed_by_version=1)
+
+    # Should have reprocessed the day
+    assert result["days_examined"] == 1
+    assert result["updates"] >= 0  # Should have updates due to hash change
+
+    # After reconciliation, no more mismatches
+    day_mismatches_after = find_day_mismatches(db, [DAY_START])
+    assert len(day_mismatches_after) == 0
+
+
+def test_idempotent_noops(db):
     """Test that reconciliation with no mismatches is idempotent."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        db_path = Path(temp_dir) / "test_idempotent.db"
-        db = Database(db_path)
-
-        try:
-            # Create test apps and windows
-            current_time = int(time.time() * 1000)
-            with db._get_connection() as conn:
-                conn.execute(
-                    "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("app1", "TestApp.exe", "hash1", current_time, current_time),
-                )
-                conn.execute(
-                    "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("window1", "app1", "hash_window1", current_time, current_time),
-                )
-
-                # Fixed times for testing
-                day_start = 1640995200000  # 2022-01-01 00:00:00 UTC
-                hour_start = day_start + 3600000  # 01:00 UTC
-
-                # Add event
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "stable_event",
-                        hour_start + 300000,  # 5 minutes into hour
-                        "keyboard",
-                        "keydown",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
-
-            # Initial summarisation - only for the hour with events
-            run_id1 = "test_idempotent_run1"
-            summarise_hours(
-                db, hour_start, hour_start + 3600000, grace_minutes=0, run_id=run_id1
-            )
-            summarise_days(db, day_start, day_start + 86400000, run_id1)
-
-            # Verify no mismatches for the single hour
-            hour_mismatches = find_hour_mismatches(
-                db, hour_start, hour_start + 3600000, grace_minutes=0
-            )
-            day_mismatches = find_day_mismatches(db, [day_start])
-            assert len(hour_mismatches) == 0
-            assert len(day_mismatches) == 0
-
-            # Run reconciliation on clean data - should be no-ops
-            run_id2 = "test_idempotent_run2"
-            hour_result = recompute_hours(
-                db, hour_mismatches, run_id2, computed_by_version=1, idle_mode="simple"
-            )
-            day_result = recompute_days(
-                db, day_mismatches, run_id2, computed_by_version=1
-            )
-
-            # Should be no-ops
-            assert hour_result["hours_examined"] == 0
-            assert hour_result["hours_reprocessed"] == 0
-            assert hour_result["inserts"] == 0
-            assert hour_result["updates"] == 0
-
-            assert day_result["days_examined"] == 0
-            assert day_result["days_reprocessed"] == 0
-            assert day_result["inserts"] == 0
-            assert day_result["updates"] == 0
-
-            # Still no mismatches after no-op reconciliation
-            hour_mismatches_after = find_hour_mismatches(
-                db, hour_start, hour_start + 3600000, grace_minutes=0
-            )
-            day_mismatches_after = find_day_mismatches(db, [day_start])
-            assert len(hour_mismatches_after) == 0
-            assert len(day_mismatches_after) == 0
-
-        finally:
-            close_db_connections(db)
+    conn = db._get_connection()
+
+    # Create test app and window with an initial event 5 minutes into hour
+    seed_app_window_events(conn, [event_row("stable_event", EVENT_TS)])
+
+    # Initial summarisation - only for the hour with events
+    run_id1 = "test_idempotent_run1"
+    summarise_hours(db, HOUR_START, HOUR_END, grace_minutes=0, run_id=run_id1)
+    summarise_days(db, DAY_START, DAY_END, run_id1)
+
+    # Verify no mismatches for the single hour
+    hour_mismatches = find_hour_mismatches(db, HOUR_START, HOUR_END, grace_minutes=0)
+    day_mismatches = find_day_mismatches(db, [DAY_START])
+    assert len(hour_mismatches) == 0
+    assert len(day_mismatches) == 0
+
+    # Run reconciliation on clean data - should be no-ops
+    run_id2 = "test_idempotent_run2"
+    hour_result = recompute_hours(
+        db, hour_mismatches, run_id2, computed_by_version=1, idle_mode="simple"
+    )
+    day_result = recompute_days(db, day_mismatches, run_id2, computed_by_version=1)
+
+    # Should be no-ops
+    assert hour_result["hours_examined"] == 0
+    assert hour_result["hours_reprocessed"] == 0
+    assert hour_result["inserts"] == 0
+    assert hour_result["updates"] == 0
+
+    assert day_result["days_examined"] == 0
+    assert day_result["days_reprocessed"] == 0
+    assert day_result["inserts"] == 0
+    assert day_result["updates"] == 0
+
+    # Still no mismatches after no-op reconciliation
+    hour_mismatches_after = find_hour_mismatches(
+        db, HOUR_START, HOUR_END, grace_minutes=0
+    )
+    day_mismatches_after = find_day_mismatches(db, [DAY_START])
+    assert len(hour_mismatches_after) == 0
+    assert len(day_mismatches_after) == 0
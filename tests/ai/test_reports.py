@@ -1,10 +1,13 @@
 """Test reporting artifacts generation."""
 
+import hashlib
 import json
 import tempfile
 import time
 from pathlib import Path
 
+import pytest
+
 from lb3.ai.report import (
     ensure_reports_dir,
     render_daily_report,
@@ -16,267 +19,255 @@ from lb3.ai.report import (
 )
 from lb3.ai.summarise import summarise_hours
 from lb3.ai.summarise_days import summarise_days
-from lb3.database import Database
-
-
-def close_db_connections(db: Database):
-    """Ensure all database connections are properly closed."""
-    try:
-        # Close any active connections
-        if hasattr(db, "_connection") and db._connection:
-            db._connection.close()
-        # Force garbage collection of any remaining connections
-        import gc
-
-        gc.collect()
-    except Exception:
-        pass
-
-
-def test_hourly_report_creation():
-    """Test hourly report creation with all formats."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        db_path = Path(temp_dir) / "test_hourly_reports.db"
-        db = Database(db_path)
-
-        try:
-            # Create test apps and windows
-            current_time = int(time.time() * 1000)
-            with db._get_connection() as conn:
-                conn.execute(
-                    "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("app1", "TestApp.exe", "hash1", current_time, current_time),
-                )
-                conn.execute(
-                    "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("window1", "app1", "hash_window1", current_time, current_time),
-                )
 
-                # Fixed hour for testing: 2022-01-01 10:00:00 UTC
-                hour_start = 1640952000000  # 2022-01-01 10:00:00 UTC
-                hour_end = hour_start + 3600000  # 11:00:00 UTC
-
-                # Add test events
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "test_focus",
-                        hour_start + 300000,  # 5 minutes into hour
-                        "active_window",
-                        "focus",
-                        "window",
-                        "session1",
-                        "window1",
-                    ),
+_INSERT_APP = "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)"
+_INSERT_WINDOW = "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)"
+_INSERT_EVENT = """
+    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_SUMMARY = """
+    INSERT INTO ai_hourly_summary (
+        hour_utc_start_ms, metric_key, value_num, input_row_count,
+        coverage_ratio, run_id, input_hash_hex, created_utc_ms,
+        updated_utc_ms, computed_by_version
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Keep the module on one xdist worker so module_db is only initialised once
+pytestmark = pytest.mark.xdist_group(name="ai_reports")
+
+# Fixed hour for testing: 2022-01-01 10:00:00 UTC
+_HOUR_START = 1640952000000
+_HOUR_END = _HOUR_START + 3600000  # 11:00:00 UTC
+
+# Stand-in input hash for seeded summaries; only its SHA-256 hex shape matters
+_SEED_HASH = "ab" * 32
+
+
+def seed_app_window_events(db, events: list[tuple]) -> None:
+    """Insert the test app, its window and the given events in one transaction."""
+    current_time = int(time.time() * 1000)
+    with db._get_connection() as conn:
+        conn.execute(
+            _INSERT_APP, ("app1", "TestApp.exe", "hash1", current_time, current_time)
+        )
+        conn.execute(
+            _INSERT_WINDOW,
+            ("window1", "app1", "hash_window1", current_time, current_time),
+        )
+        conn.executemany(_INSERT_EVENT, events)
+
+
+def seed_hour_summary(
+    db, hstart_ms: int, metrics: dict[str, float], run_id: str
+) -> None:
+    """Store one ai_hourly_summary row per metric for the given hour."""
+    current_time = int(time.time() * 1000)
+    with db._get_connection() as conn:
+        conn.executemany(
+            _INSERT_SUMMARY,
+            [
+                (
+                    hstart_ms,
+                    metric_key,
+                    value,
+                    1,
+                    1.0,
+                    run_id,
+                    _SEED_HASH,
+                    current_time,
+                    current_time,
+                    1,
                 )
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "test_key",
-                        hour_start + 600000,  # 10 minutes into hour
-                        "keyboard",
-                        "keydown",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
-
-            # Create hourly summaries
-            run_id = "test_hourly_report_run"
-            summarise_hours(db, hour_start, hour_end, grace_minutes=0, run_id=run_id)
-
-            # Test report rendering
-            report_data = render_hourly_report(db, hour_start, hour_end)
-
-            # Verify report structure
-            assert "hour_hash" in report_data
-            assert "txt" in report_data
-            assert "json" in report_data
-            assert "csv_rows" in report_data
-
-            assert len(report_data["hour_hash"]) == 64  # SHA-256 hex
-            assert isinstance(report_data["txt"], str)
-            assert isinstance(report_data["json"], dict)
-            assert isinstance(report_data["csv_rows"], list)
-
-            # Verify JSON structure
-            json_data = report_data["json"]
-            assert json_data["hour_start_ms"] == hour_start
-            assert "metrics" in json_data
-            assert "hour_hash" in json_data
-
-            # Test file writing
-            with tempfile.TemporaryDirectory() as file_dir:
-                file_dir_path = Path(file_dir)
-
-                # Test TXT writing
-                txt_path = file_dir_path / "test.txt"
-                txt_hash = write_text(txt_path, report_data["txt"])
-                assert len(txt_hash) == 64  # SHA-256 hex
-                assert txt_path.exists()
-
-                # Test JSON writing
-                json_path = file_dir_path / "test.json"
-                json_hash = write_json(json_path, report_data["json"])
-                assert len(json_hash) == 64  # SHA-256 hex
-                assert json_path.exists()
-
-                # Test CSV writing
-                csv_path = file_dir_path / "test.csv"
-                csv_hash = write_csv(csv_path, report_data["csv_rows"])
-                assert len(csv_hash) == 64  # SHA-256 hex
-                assert csv_path.exists()
-
-            # Test ai_report row upsert
-            result1 = upsert_report_row(
-                db,
-                kind="hourly",
-                period_start_ms=hour_start,
-                period_end_ms=hour_end,
-                format="txt",
-                file_path="test/path.txt",
-                file_sha256=txt_hash,
-                run_id=run_id,
-                input_hash_hex=report_data["hour_hash"],
-            )
-            assert result1["action"] == "inserted"
-
-            # Test idempotency - same inputs should not change
-            result2 = upsert_report_row(
-                db,
-                kind="hourly",
-                period_start_ms=hour_start,
-                period_end_ms=hour_end,
-                format="txt",
-                file_path="test/path.txt",
-                file_sha256=txt_hash,
-                run_id=run_id,
-                input_hash_hex=report_data["hour_hash"],
-            )
-            assert result2["action"] == "unchanged"
-
-            # Test update when file_sha256 changes
-            result3 = upsert_report_row(
-                db,
-                kind="hourly",
-                period_start_ms=hour_start,
-                period_end_ms=hour_end,
-                format="txt",
-                file_path="test/path.txt",
-                file_sha256="different_hash",
-                run_id=run_id,
-                input_hash_hex=report_data["hour_hash"],
-            )
-            assert result3["action"] == "updated"
+                for metric_key, value in metrics.items()
+            ],
+        )
+
+
+@pytest.fixture(scope="module")
+def hourly_report(module_db):
+    """Hourly report rendered once from directly seeded summary rows."""
+    # Seed the hour's summary directly rather than running summarise_hours
+    seed_hour_summary(
+        module_db,
+        _HOUR_START,
+        {"focus_minutes": 5.0, "keyboard_events": 1.0, "switches": 0.0},
+        "test_hourly_report_run",
+    )
+    return render_hourly_report(module_db, _HOUR_START, _HOUR_END)
+
+
+def test_hourly_report_creation(module_db, hourly_report):
+    """Test hourly report structure and ai_report row upsert."""
+    report_data = hourly_report
+
+    # Verify report structure
+    assert "hour_hash" in report_data
+    assert "txt" in report_data
+    assert "json" in report_data
+    assert "csv_rows" in report_data
+
+    assert len(report_data["hour_hash"]) == 64  # SHA-256 hex
+    assert report_data["hour_hash"] == _SEED_HASH  # Taken from the stored summary
+    assert isinstance(report_data["txt"], str)
+    assert isinstance(report_data["json"], dict)
+    assert isinstance(report_data["csv_rows"], list)
+
+    # Verify JSON structure
+    json_data = report_data["json"]
+    assert json_data["hour_start_ms"] == _HOUR_START
+    assert "metrics" in json_data
+    assert "hour_hash" in json_data
+
+    # Hash of the TXT artifact as write_text would return it
+    txt_hash = hashlib.sha256(report_data["txt"].encode("utf-8")).hexdigest()
+
+    # Test ai_report row upsert
+    result1 = upsert_report_row(
+        module_db,
+        kind="hourly",
+        period_start_ms=_HOUR_START,
+        period_end_ms=_HOUR_END,
+        format="txt",
+        file_path="test/path.txt",
+        file_sha256=txt_hash,
+        run_id="test_hourly_report_run",
+        input_hash_hex=report_data["hour_hash"],
+    )
+    assert result1["action"] == "inserted"
+
+    # Test idempotency - same inputs should not change
+    result2 = upsert_report_row(
+        module_db,
+        kind="hourly",
+        period_start_ms=_HOUR_START,
+        period_end_ms=_HOUR_END,
+        format="txt",
+        file_path="test/path.txt",
+        file_sha256=txt_hash,
+        run_id="test_hourly_report_run",
+        input_hash_hex=report_data["hour_hash"],
+    )
+    assert result2["action"] == "unchanged"
+
+    # Test update when file_sha256 changes
+    result3 = upsert_report_row(
+        module_db,
+        kind="hourly",
+        period_start_ms=_HOUR_START,
+        period_end_ms=_HOUR_END,
+        format="txt",
+        file_path="test/path.txt",
+        file_sha256="different_hash",
+        run_id="test_hourly_report_run",
+        input_hash_hex=report_data["hour_hash"],
+    )
+    assert result3["action"] == "updated"  # Same row updated, not a second insert
+
+
+@pytest.mark.parametrize(
+    "writer, key, ext",
+    [
+        (write_text, "txt", "txt"),
+        (write_json, "json", "json"),
+        (write_csv, "csv_rows", "csv"),
+    ],
+    ids=["txt", "json", "csv"],
+)
+def test_report_writer(hourly_report, tmp_path, writer, key, ext):
+    """Test that each writer creates its file and returns the SHA-256 of its bytes."""
+    path = tmp_path / f"test.{ext}"
+    file_hash = writer(path, hourly_report[key])
 
-            # Verify row count stays controlled
-            with db._get_connection() as conn:
-                count = conn.execute("SELECT COUNT(*) FROM ai_report").fetchone()[0]
-                assert count == 1  # Only one row despite multiple operations
+    assert len(file_hash) == 64  # SHA-256 hex
+    assert path.exists()
+    assert file_hash == hashlib.sha256(path.read_bytes()).hexdigest()
 
-        finally:
-            close_db_connections(db)
 
+def test_write_json_pins_non_ascii_bytes(tmp_path):
+    """Test that write_json output bytes and hash stay fixed for non-ASCII text."""
+    path = tmp_path / "non_ascii.json"
+    file_hash = write_json(path, {"app": "Café — 東京", "minutes": 12.5, "count": 3})
 
-def test_daily_report_creation():
-    """Test daily report creation with all formats."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        db_path = Path(temp_dir) / "test_daily_reports.db"
-        db = Database(db_path)
-
-        try:
-            # Create test apps and windows
-            current_time = int(time.time() * 1000)
-            with db._get_connection() as conn:
-                conn.execute(
-                    "INSERT INTO apps (id, exe_name, exe_path_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("app1", "TestApp.exe", "hash1", current_time, current_time),
-                )
-                conn.execute(
-                    "INSERT INTO windows (id, app_id, title_hash, first_seen_utc, last_seen_utc) VALUES (?, ?, ?, ?, ?)",
-                    ("window1", "app1", "hash_window1", current_time, current_time),
-                )
+    assert path.read_bytes() == (
+        b'{\n  "app": "Caf\\u00e9 \\u2014 \\u6771\\u4eac",\n'
+        b'  "count": 3,\n  "minutes": 12.5\n}\n'
+    )
+    assert file_hash == (
+        "6256f68b44c863db9ac2d79b4a2acbb9fe49ed197975b9007a5855b7ac88fc13"
+    )
 
-                # Fixed day for testing: 2022-01-01 00:00:00 UTC
-                day_start = 1640995200000
-                hour_start = day_start + 3600000  # 01:00 UTC
-
-                # Add test event
-                conn.execute(
-                    """
-                    INSERT INTO events (id, ts_utc, monitor, action, subject_type, session_id, subject_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        "test_daily_event",
-                        hour_start + 300000,  # 5 minutes into hour
-                        "keyboard",
-                        "keydown",
-                        "app",
-                        "session1",
-                        "app1",
-                    ),
-                )
-                conn.commit()
 
-            # Create hourly and daily summaries
-            run_id = "test_daily_report_run"
-            summarise_hours(
-                db, hour_start, hour_start + 3600000, grace_minutes=0, run_id=run_id
+def test_daily_report_creation(db):
+    """Test daily report creation with all formats."""
+    # Fixed day for testing: 2022-01-01 00:00:00 UTC
+    day_start = 1640995200000
+    hour_start = day_start + 3600000  # 01:00 UTC
+
+    # Create test app and window with one key event
+    seed_app_window_events(
+        db,
+        [
+            (
+                "test_daily_event",
+                hour_start + 300000,  # 5 minutes into hour
+                "keyboard",
+                "keydown",
+                "app",
+                "session1",
+                "app1",
             )
-            summarise_days(db, day_start, day_start + 86400000, run_id)
-
-            # Test report rendering
-            report_data = render_daily_report(db, day_start)
-
-            # Verify report structure
-            assert "day_hash" in report_data
-            assert "txt" in report_data
-            assert "json" in report_data
-            assert "csv_rows" in report_data
-
-            assert report_data["day_hash"] is not None
-            assert len(report_data["day_hash"]) == 64  # SHA-256 hex
-            assert isinstance(report_data["txt"], str)
-            assert isinstance(report_data["json"], dict)
-            assert isinstance(report_data["csv_rows"], list)
-
-            # Verify JSON structure
-            json_data = report_data["json"]
-            assert json_data["day_start_ms"] == day_start
-            assert "metrics" in json_data
-            assert "day_hash" in json_data
-
-            # Test file writing and ai_report row upsert
-            with tempfile.TemporaryDirectory() as file_dir:
-                file_dir_path = Path(file_dir)
-
-                txt_path = file_dir_path / "daily.txt"
-                txt_hash = write_text(txt_path, report_data["txt"])
-
-                result = upsert_report_row(
-                    db,
-                    kind="daily",
-                    period_start_ms=day_start,
-                    period_end_ms=day_start + 86400000,
-                    format="txt",
-                    file_path="daily/path.txt",
-                    file_sha256=txt_hash,
-                    run_id=run_id,
-                    input_hash_hex=report_data["day_hash"],
-                )
-                assert result["action"] == "inserted"
-
-        finally:
-            close_db_connections(db)
+        ],
+    )
+
+    # Create hourly and daily summaries
+    run_id = "test_daily_report_run"
+    summarise_hours(
+        db, hour_start, hour_start + 3600000, grace_minutes=0, run_id=run_id
+    )
+    summarise_days(db, day_start, day_start + 86400000, run_id)
+
+    # Test report rendering
+    report_data = render_daily_report(db, day_start)
+
+    # Verify report structure
+    assert "day_hash" in report_data
+    assert "txt" in report_data
+    assert "json" in report_data
+    assert "csv_rows" in report_data
+
+    assert report_data["day_hash"] is not None
+    assert len(report_data["day_hash"]) == 64  # SHA-256 hex
+    assert isinstance(report_data["txt"], str)
+    assert isinstance(report_data["json"], dict)
+    assert isinstance(report_data["csv_rows"], list)
+
+    # Verify JSON structure
+    json_data = report_data["json"]
+    assert json_data["day_start_ms"] == day_start
+    assert "metrics" in json_data
+    assert "day_hash" in json_data
+
+    # Test file writing and ai_report row upsert
+    with tempfile.TemporaryDirectory() as file_dir:
+        file_dir_path = Path(file_dir)
+
+        txt_path = file_dir_path / "daily.txt"
+        txt_hash = write_text(txt_path, report_data["txt"])
+
+        result = upsert_report_row(
+            db,
+            kind="daily",
+            period_start_ms=day_start,
+            period_end_ms=day_start + 86400000,
+            format="txt",
+            file_path="daily/path.txt",
+            file_sha256=txt_hash,
+            run_id=run_id,
+            input_hash_hex=report_data["day_hash"],
+        )
+        assert result["action"] == "inserted"
 
 
 def test_report_show_content():
@@ -316,18 +307,10 @@ def test_report_show_content():
         assert "metric_key" in lines[0]  # Header contains expected field
 
 
-def test_ensure_reports_dir():
+def test_ensure_reports_dir(tmp_path):
     """Test reports directory creation."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Change to temp directory for this test
-        import os
-
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(temp_dir)
-            reports_dir = ensure_reports_dir()
-            assert reports_dir.exists()
-            assert reports_dir.name == "reports"
-            assert reports_dir.is_dir()
-        finally:
-            os.chdir(original_cwd)
+    reports_dir = ensure_reports_dir(tmp_path)
+    assert reports_dir.exists()
+    assert reports_dir.name == "reports"
+    assert reports_dir.is_dir()
+    assert reports_dir == tmp_path / "lb_data" / "reports"
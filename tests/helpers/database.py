@@ -0,0 +1,8 @@
+"""Database helpers shared across tests."""
+
+from lb3.database import Database
+
+
+def close_db_connections(db: Database) -> None:
+    """Ensure all database connections are properly closed."""
+    db.close()
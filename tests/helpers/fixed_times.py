@@ -0,0 +1,8 @@
+"""Fixed UTC timestamps shared by summary and reconciliation tests."""
+
+DAY_START = 1640995200000  # 2022-01-01 00:00:00 UTC
+DAY_END = DAY_START + 86400000
+HOUR_START = DAY_START + 3600000  # 01:00 UTC
+HOUR_END = HOUR_START + 3600000  # 02:00 UTC
+EVENT_TS = HOUR_START + 300000  # 5 minutes into hour
+LATE_EVENT_TS = HOUR_START + 600000  # 10 minutes into hour
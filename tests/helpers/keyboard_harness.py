@@ -1,11 +1,22 @@
 """Test harness helper for keyboard monitor testing."""
 
+from types import SimpleNamespace
 from typing import Optional
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 
 from lb3.monitors.keyboard import BatchConfig, FakeKeyboardSource, KeyboardMonitor
 from lb3.utils.scheduler import ManualScheduler
 
+# Config with guardrails enabled, built once and shared by every harness monitor
+_GUARDRAILS_CONFIG = SimpleNamespace(
+    guardrails=SimpleNamespace(no_global_text_keylogging=True)
+)
+
+
+def _get_guardrails_config() -> SimpleNamespace:
+    """Stand-in for get_effective_config while constructing test monitors."""
+    return _GUARDRAILS_CONFIG
+
 
 def build_inline_keyboard_monitor(
     batch_time_s: float = 0.3,
@@ -34,11 +45,10 @@ def build_inline_keyboard_monitor(
 
     batch_config = BatchConfig(max_size=batch_size, max_time_s=batch_time_s)
 
-    # Mock config with guardrails enabled
-    mock_config = Mock()
-    mock_config.guardrails.no_global_text_keylogging = True
-
-    with patch("lb3.monitors.keyboard.get_effective_config", return_value=mock_config):
+    # Plain replacement function, so patching doesn't build a Mock per monitor
+    with patch(
+        "lb3.monitors.keyboard.get_effective_config", new=_get_guardrails_config
+    ):
         monitor = KeyboardMonitor(
             dry_run=dry_run,
             batch_config=batch_config,
@@ -64,18 +74,23 @@ def feed_keys(
         spacing_ms: Milliseconds between each key event
         scheduler: ManualScheduler to advance time with
     """
+    if scheduler is None:
+        # No clock to step, so use the monitor's own pair loop
+        monitor.emit_keys_inline(n)
+        return
+
     spacing_s = spacing_ms / 1000.0
+    gap_s = spacing_s / 2  # Small gap between down/up
 
+    # Each advance may fire due flushes, so time still steps per event
+    advance = scheduler.advance
+    emit_down = monitor.emit_keydown_inline
+    emit_up = monitor.emit_keyup_inline
     for _i in range(n):
-        if scheduler:
-            scheduler.advance(spacing_s)
-
-        monitor.emit_keydown_inline()
-
-        if scheduler:
-            scheduler.advance(spacing_s / 2)  # Small gap between down/up
-
-        monitor.emit_keyup_inline()
+        advance(spacing_s)
+        emit_down()
+        advance(gap_s)
+        emit_up()
 
 
 def feed_burst_keys(
@@ -97,11 +112,13 @@ def feed_burst_keys(
 
     spacing_s = (total_time_ms / 1000.0) / (n - 1)
 
-    for i in range(n):
-        if i > 0 and scheduler:
+    emit_down = monitor.emit_keydown_inline
+    emit_down()
+    for _i in range(n - 1):
+        if scheduler:
             scheduler.advance(spacing_s)
 
-        monitor.emit_keydown_inline()
+        emit_down()
 
 
 def advance_time_and_check_flush(
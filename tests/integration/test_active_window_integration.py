@@ -5,6 +5,7 @@ import contextlib
 import ctypes
 import subprocess
 import sys
+import threading
 import time
 from unittest import skipUnless
 
@@ -14,31 +15,93 @@ from lb3.database import get_database
 from lb3.events import get_event_bus
 from lb3.monitors.active_window import ActiveWindowMonitor
 
+if sys.platform == "win32":
+    from ctypes import wintypes
+
+    # Private handle, so these prototypes never leak into the shared ctypes.windll
+    _user32 = ctypes.WinDLL("user32")
+
+    _EnumWindowsProc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+
+    # Full-width handles, so nothing is truncated on 64-bit Windows
+    _user32.EnumWindows.restype = wintypes.BOOL
+    _user32.EnumWindows.argtypes = [_EnumWindowsProc, wintypes.LPARAM]
+    _user32.GetForegroundWindow.restype = wintypes.HWND
+    _user32.GetForegroundWindow.argtypes = []
+    _user32.SetForegroundWindow.restype = wintypes.BOOL
+    _user32.SetForegroundWindow.argtypes = [wintypes.HWND]
+    _user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+    _user32.GetWindowThreadProcessId.argtypes = [
+        wintypes.HWND,
+        ctypes.POINTER(wintypes.DWORD),
+    ]
+    _user32.IsWindow.restype = wintypes.BOOL
+    _user32.IsWindow.argtypes = [wintypes.HWND]
+    _user32.IsWindowVisible.restype = wintypes.BOOL
+    _user32.IsWindowVisible.argtypes = [wintypes.HWND]
+    _user32.GetWindowTextLengthW.restype = ctypes.c_int
+    _user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
+
 
 @skipUnless(
     sys.platform == "win32", "ActiveWindowMonitor integration tests only run on Windows"
 )
+# Tests share the class monitor and the desktop foreground, so keep them on one worker
+@pytest.mark.xdist_group(name="active_window")
 class TestActiveWindowIntegration:
     """Integration tests for ActiveWindowMonitor with real Windows processes."""
 
+    # Main window handle found for each launched process id
+    _hwnd_cache: dict[int, int] = {}
+
+    @classmethod
+    def setup_class(cls):
+        """Start one event bus and monitor shared by every test in the class."""
+        cls.received_events = []
+        # Lower-cased exe_name per received event, kept parallel to received_events
+        cls.received_exe_names = []
+        cls._events_cond = threading.Condition()
+        cls.event_bus = None
+        cls.shared_monitor = None
+        cls._setup_event_collection()
+
+        cls.shared_monitor = ActiveWindowMonitor(dry_run=False)
+        cls.shared_monitor.start()
+
+        # Give monitor time to initialize
+        time.sleep(0.5)
+
+    @classmethod
+    def teardown_class(cls):
+        """Stop the shared monitor and event bus."""
+        if cls.shared_monitor:
+            with contextlib.suppress(builtins.BaseException):
+                cls.shared_monitor.stop()
+
+        if cls.event_bus:
+            with contextlib.suppress(builtins.BaseException):
+                cls.event_bus.stop()
+
     def setup_method(self):
         """Set up test environment."""
         self.launched_processes = []
         self.monitor = None
-        self.event_bus = None
-        self.received_events = []
+        self.shared_monitor_paused = False
+        self._clear_events()
 
     def teardown_method(self):
         """Clean up test environment."""
-        # Stop monitor
+        # Stop any monitor the test started itself
         if self.monitor:
             with contextlib.suppress(builtins.BaseException):
                 self.monitor.stop()
 
-        # Stop event bus
-        if self.event_bus:
-            with contextlib.suppress(builtins.BaseException):
-                self.event_bus.stop()
+        # Bring back the shared monitor for later tests if this one paused it
+        if self.shared_monitor_paused:
+            cls = type(self)
+            cls.shared_monitor = ActiveWindowMonitor(dry_run=False)
+            cls.shared_monitor.start()
+            time.sleep(0.5)
 
         # Kill launched processes
         for process in self.launched_processes:
@@ -49,6 +112,16 @@ class TestActiveWindowIntegration:
                 with contextlib.suppress(BaseException):
                     process.kill()
 
+    def _pause_shared_monitor(self):
+        """Stop the shared monitor so only monitors the test starts emit events."""
+        cls = type(self)
+        if cls.shared_monitor:
+            with contextlib.suppress(builtins.BaseException):
+                cls.shared_monitor.stop()
+            cls.shared_monitor = None
+        self.shared_monitor_paused = True
+        self._clear_events()
+
     def _launch_process(self, executable, args=None):
         """Launch a process and track it for cleanup."""
         cmd = [executable]
@@ -67,75 +140,106 @@ class TestActiveWindowIntegration:
         except FileNotFoundError:
             pytest.skip(f"Executable {executable} not found")
 
-    def _set_foreground_window_by_process(self, process, max_attempts=10):
-        """Set foreground window for a process by finding its main window."""
-        from ctypes import wintypes
+    def _is_foreground_process(self, process):
+        """Check whether the current foreground window belongs to process."""
+        foreground_hwnd = _user32.GetForegroundWindow()
+        if not foreground_hwnd:
+            return False
+        pid = wintypes.DWORD()
+        _user32.GetWindowThreadProcessId(foreground_hwnd, ctypes.byref(pid))
+        return pid.value == process.pid
 
-        user32 = ctypes.windll.user32
+    def _find_main_window(self, process):
+        """Find process's visible, titled top-level window via EnumWindows."""
+        found = []
 
         def enum_windows_proc(hwnd, lParam):
             """Callback for EnumWindows."""
             pid = wintypes.DWORD()
-            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-
-            if pid.value == process.pid:
-                # Check if this is a main window (has title and is visible)
-                if user32.IsWindowVisible(hwnd):
-                    length = user32.GetWindowTextLengthW(hwnd)
-                    if length > 0:
-                        # Set this window as foreground
-                        user32.SetForegroundWindow(hwnd)
-                        return False  # Stop enumeration
+            _user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+
+            # Check if this is a main window (has title and is visible)
+            if (
+                pid.value == process.pid
+                and _user32.IsWindowVisible(hwnd)
+                and _user32.GetWindowTextLengthW(hwnd) > 0
+            ):
+                found.append(hwnd)
+                return False  # Stop enumeration
             return True  # Continue enumeration
 
-        # Define callback type
-        EnumWindowsProc = ctypes.WINFUNCTYPE(
-            wintypes.BOOL, wintypes.HWND, wintypes.LPARAM
-        )
-        enum_func = EnumWindowsProc(enum_windows_proc)
+        _user32.EnumWindows(_EnumWindowsProc(enum_windows_proc), 0)
+        return found[0] if found else None
+
+    def _set_foreground_window_by_process(self, process, max_attempts=10):
+        """Set foreground window for a process by finding its main window."""
+        # Reuse the window found on an earlier call if it is still around
+        hwnd = self._hwnd_cache.get(process.pid)
+        if hwnd and _user32.IsWindow(hwnd) and _user32.IsWindowVisible(hwnd):
+            _user32.SetForegroundWindow(hwnd)
+            time.sleep(0.2)  # Give time for window to become active
+            if self._is_foreground_process(process):
+                return True
 
         # Try multiple times as window might not be ready immediately
         for _attempt in range(max_attempts):
-            user32.EnumWindows(enum_func, 0)
+            hwnd = self._find_main_window(process)
+            if hwnd:
+                # Remember and set this window as foreground
+                self._hwnd_cache[process.pid] = hwnd
+                _user32.SetForegroundWindow(hwnd)
             time.sleep(0.2)  # Give time for window to become active
 
             # Check if we successfully set foreground
-            foreground_hwnd = user32.GetForegroundWindow()
-            if foreground_hwnd:
-                pid = wintypes.DWORD()
-                user32.GetWindowThreadProcessId(foreground_hwnd, ctypes.byref(pid))
-                if pid.value == process.pid:
-                    return True
+            if self._is_foreground_process(process):
+                return True
 
         return False
 
-    def _setup_event_collection(self):
+    @classmethod
+    def _setup_event_collection(cls):
         """Set up event bus and collection."""
-        self.event_bus = get_event_bus()
+        cls.event_bus = get_event_bus()
 
         def event_collector(event):
-            self.received_events.append(event)
-
-        self.event_bus.subscribe(event_collector)
-        self.event_bus.start()
-
-    def test_notepad_explorer_window_switching(self):
-        """Test window switching between Notepad and Explorer."""
-        # Setup event collection
-        self._setup_event_collection()
+            with cls._events_cond:
+                cls.received_events.append(event)
+                cls.received_exe_names.append(
+                    (getattr(event, "exe_name", None) or "").lower()
+                )
+                cls._events_cond.notify_all()
+
+        cls.event_bus.subscribe(event_collector)
+        cls.event_bus.start()
+
+    def _clear_events(self):
+        """Drop events collected so far."""
+        with self._events_cond:
+            self.received_events.clear()
+            self.received_exe_names.clear()
+
+    def _events_for(self, exe_fragment):
+        """Return collected events whose lower-cased exe_name contains exe_fragment."""
+        with self._events_cond:
+            return [
+                event
+                for event, exe_name in zip(
+                    self.received_events, self.received_exe_names
+                )
+                if exe_fragment in exe_name
+            ]
 
-        # Create monitor
-        self.monitor = ActiveWindowMonitor(dry_run=False)
+    def _wait_for_exe_event(self, exe_fragment, timeout=3.0):
+        """Block until an event for an executable matching exe_fragment arrives."""
 
-        # Start monitor
-        self.monitor.start()
+        def has_event():
+            return any(exe_fragment in name for name in self.received_exe_names)
 
-        # Give monitor time to initialize
-        time.sleep(0.5)
-
-        # Clear any initial events
-        self.received_events.clear()
+        with self._events_cond:
+            return self._events_cond.wait_for(has_event, timeout)
 
+    def test_notepad_explorer_window_switching(self):
+        """Test window switching between Notepad and Explorer."""
         # Launch Notepad
         notepad = self._launch_process("notepad.exe")
         time.sleep(1.0)  # Wait for process to start
@@ -145,14 +249,10 @@ class TestActiveWindowIntegration:
         if not success:
             pytest.skip("Could not set Notepad as foreground window")
 
-        time.sleep(1.5)  # Wait for monitor to detect change
+        self._wait_for_exe_event("notepad")  # Wait for monitor to detect change
 
         # Check that we got a window change event for Notepad
-        notepad_events = [
-            e
-            for e in self.received_events
-            if hasattr(e, "exe_name") and e.exe_name and "notepad" in e.exe_name.lower()
-        ]
+        notepad_events = self._events_for("notepad")
         assert (
             len(notepad_events) >= 1
         ), f"Expected Notepad event, got: {[getattr(e, 'exe_name', 'unknown') for e in self.received_events]}"
@@ -175,7 +275,7 @@ class TestActiveWindowIntegration:
         assert "app_id" in attrs
 
         # Clear events
-        self.received_events.clear()
+        self._clear_events()
 
         # Launch Explorer
         explorer = self._launch_process("explorer.exe")
@@ -186,16 +286,10 @@ class TestActiveWindowIntegration:
         if not success:
             pytest.skip("Could not set Explorer as foreground window")
 
-        time.sleep(1.5)  # Wait for monitor to detect change
+        self._wait_for_exe_event("explorer")  # Wait for monitor to detect change
 
         # Check that we got a window change event for Explorer
-        explorer_events = [
-            e
-            for e in self.received_events
-            if hasattr(e, "exe_name")
-            and e.exe_name
-            and "explorer" in e.exe_name.lower()
-        ]
+        explorer_events = self._events_for("explorer")
         assert (
             len(explorer_events) >= 1
         ), f"Expected Explorer event, got: {[getattr(e, 'exe_name', 'unknown') for e in self.received_events]}"
@@ -215,30 +309,16 @@ class TestActiveWindowIntegration:
         assert notepad_event.subject_id != explorer_event.subject_id
 
         # Switch back to Notepad
-        self.received_events.clear()
+        self._clear_events()
         self._set_foreground_window_by_process(notepad)
-        time.sleep(1.5)
+        self._wait_for_exe_event("notepad")
 
         # Should get another event for switching back
-        final_events = [
-            e
-            for e in self.received_events
-            if hasattr(e, "exe_name") and e.exe_name and "notepad" in e.exe_name.lower()
-        ]
+        final_events = self._events_for("notepad")
         assert len(final_events) >= 1, "Expected event when switching back to Notepad"
 
     def test_no_events_when_stationary(self):
         """Test that no extra events are generated when window stays the same."""
-        # Setup event collection
-        self._setup_event_collection()
-
-        # Create monitor
-        self.monitor = ActiveWindowMonitor(dry_run=False)
-        self.monitor.start()
-
-        # Wait for initialization
-        time.sleep(0.5)
-
         # Launch Notepad and set as foreground
         notepad = self._launch_process("notepad.exe")
         time.sleep(1.0)
@@ -247,31 +327,19 @@ class TestActiveWindowIntegration:
         if not success:
             pytest.skip("Could not set Notepad as foreground window")
 
-        time.sleep(1.5)  # Wait for initial detection
+        self._wait_for_exe_event("notepad")  # Wait for initial detection
 
         # Count events so far
-        initial_count = len(
-            [
-                e
-                for e in self.received_events
-                if hasattr(e, "exe_name")
-                and e.exe_name
-                and "notepad" in e.exe_name.lower()
-            ]
-        )
+        initial_count = len(self._events_for("notepad"))
 
         assert initial_count >= 1, "Should have initial event"
 
         # Clear events and wait longer with no changes
-        self.received_events.clear()
+        self._clear_events()
         time.sleep(3.0)  # Wait multiple poll cycles
 
         # Should not have any new events since window didn't change
-        new_events = [
-            e
-            for e in self.received_events
-            if hasattr(e, "exe_name") and e.exe_name and "notepad" in e.exe_name.lower()
-        ]
+        new_events = self._events_for("notepad")
 
         assert (
             len(new_events) == 0
@@ -287,13 +355,6 @@ class TestActiveWindowIntegration:
             conn.execute("DELETE FROM windows WHERE id LIKE 'test_%'")
             conn.execute("DELETE FROM apps WHERE id LIKE 'test_%'")
 
-        # Create monitor (dry_run=False to use database)
-        self.monitor = ActiveWindowMonitor(dry_run=False)
-        self.monitor.start()
-
-        # Wait for initialization
-        time.sleep(0.5)
-
         # Launch Notepad
         notepad = self._launch_process("notepad.exe")
         time.sleep(1.0)
@@ -338,11 +399,12 @@ class TestActiveWindowIntegration:
 
     def test_stable_subject_ids(self):
         """Test that subject IDs are stable across monitor restarts."""
-        # Setup event collection
-        self._setup_event_collection()
+        # Events must come from the restarted monitors, not the shared one
+        self._pause_shared_monitor()
 
         # Create first monitor instance
         monitor1 = ActiveWindowMonitor(dry_run=False)
+        self.monitor = monitor1  # Stopped in teardown if the test bails out
         monitor1.start()
         time.sleep(0.5)
 
@@ -354,14 +416,10 @@ class TestActiveWindowIntegration:
         if not success:
             pytest.skip("Could not set Notepad as foreground window")
 
-        time.sleep(1.5)
+        self._wait_for_exe_event("notepad")
 
         # Get first event
-        notepad_events = [
-            e
-            for e in self.received_events
-            if hasattr(e, "exe_name") and e.exe_name and "notepad" in e.exe_name.lower()
-        ]
+        notepad_events = self._events_for("notepad")
         assert len(notepad_events) >= 1
 
         first_event = notepad_events[0]
@@ -371,21 +429,18 @@ class TestActiveWindowIntegration:
         monitor1.stop()
 
         # Clear events and create second monitor instance
-        self.received_events.clear()
+        self._clear_events()
         monitor2 = ActiveWindowMonitor(dry_run=False)
+        self.monitor = monitor2
         monitor2.start()
         time.sleep(0.5)
 
         # Trigger window detection again
         self._set_foreground_window_by_process(notepad)
-        time.sleep(1.5)
+        self._wait_for_exe_event("notepad")
 
         # Get second event
-        second_events = [
-            e
-            for e in self.received_events
-            if hasattr(e, "exe_name") and e.exe_name and "notepad" in e.exe_name.lower()
-        ]
+        second_events = self._events_for("notepad")
         assert len(second_events) >= 1
 
         second_event = second_events[0]
@@ -1,43 +1,96 @@
 """Integration tests for CLI run command."""
 
 import json
-import tempfile
-import time
-from pathlib import Path
+import logging
+import re
+import threading
 from unittest.mock import patch
 
+import pytest
 from click.testing import CliRunner
+from typer.main import get_command
 
 from lb3.cli import app
 
+# Click command tree for the Typer app, built once for the subcommand smoke tests
+_CLI = get_command(app)
+
+
+class _FakeClockEvent(threading.Event):
+    """Stop event whose timed waits advance a fake clock instead of blocking."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def wait(self, timeout=None):
+        if timeout is not None and not self.is_set():
+            self._clock.advance(timeout)
+        return self.is_set()
+
+
+@pytest.fixture
+def run_clock(fake_clock, monkeypatch):
+    """Drive dry-run heartbeats from the fake clock.
+
+    Only the heartbeat's interval waits advance the clock, so a run of N beats
+    moves it forward exactly N - 1 intervals (the first beat fires on start).
+    Supervisor polling stays on real time and never touches the fake clock.
+    """
+    from lb3.monitors.heartbeat import HeartbeatMonitor
+
+    original_init = HeartbeatMonitor.__init__
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        self._stop_event = _FakeClockEvent(fake_clock)
+
+    monkeypatch.setattr(HeartbeatMonitor, "__init__", init)
+    return fake_clock
+
+
+def _heartbeat_events(output):
+    """Decode the indented JSON event printed after each heartbeat line."""
+    decoder = json.JSONDecoder()
+    events = []
+    for match in re.finditer(r"^\[heartbeat\] heartbeat at .*?: ", output, re.M):
+        event, _ = decoder.raw_decode(output, match.end())
+        events.append(event)
+    return events
+
+
+@pytest.fixture(scope="class")
+def runner():
+    """CliRunner shared by every test in the class."""
+    return CliRunner()
+
 
 class TestCliRun:
     """Test CLI run command integration."""
 
-    def test_run_dry_run_help(self):
+    def test_run_dry_run_help(self, runner):
         """Test run command help."""
-        runner = CliRunner()
-        result = runner.invoke(app, ["run", "--help"])
+        result = runner.invoke(_CLI.commands["run"], ["--help"])
 
         assert result.exit_code == 0
         assert "--dry-run" in result.output
         assert "--duration" in result.output
 
-    def test_run_dry_run_basic(self):
+    def test_run_dry_run_basic(self, run_clock, runner, caplog):
         """Test basic dry-run functionality."""
-        runner = CliRunner()
-        result = runner.invoke(app, ["run", "--dry-run", "--duration", "1"])
+        with caplog.at_level(logging.INFO):
+            result = runner.invoke(_CLI, ["run", "--dry-run", "--duration", "1"])
 
         assert result.exit_code == 0
         assert "[DRY-RUN]" in result.output
-        assert "Starting heartbeat monitor" in result.output
+        # The heartbeat announces itself through logging, not on stdout
+        assert "Starting heartbeat monitor" in caplog.text
         assert "Events will be printed to console" in result.output
         assert "Monitoring stopped" in result.output
 
-    def test_run_dry_run_events_printed(self):
+    def test_run_dry_run_events_printed(self, run_clock, runner):
         """Test that events are actually printed in dry-run mode."""
-        runner = CliRunner()
-        result = runner.invoke(app, ["run", "--dry-run", "--duration", "2"])
+        result = runner.invoke(_CLI, ["run", "--dry-run", "--duration", "2"])
 
         assert result.exit_code == 0
 
@@ -45,72 +98,51 @@ class TestCliRun:
         assert "[heartbeat] heartbeat at" in result.output
 
         # Parse the JSON events from output
-        lines = result.output.split("\\n")
-        event_lines = [line for line in lines if line.startswith("[heartbeat]")]
+        events = _heartbeat_events(result.output)
 
         # Should have at least one event
-        assert len(event_lines) >= 1
+        assert len(events) >= 1
 
         # Check event structure
-        for event_line in event_lines:
-            # Extract JSON part after the timestamp
-            json_start = event_line.find("{")
-            if json_start != -1:
-                json_str = event_line[json_start:]
-                event_data = json.loads(json_str)
-
-                # Verify event structure
-                assert "id" in event_data
-                assert "ts_utc" in event_data
-                assert event_data["monitor"] == "heartbeat"
-                assert event_data["action"] == "heartbeat"
-                assert event_data["subject_type"] == "none"
-                assert "session_id" in event_data
-                assert "attrs_json" in event_data
-
-                # Check attrs_json content
-                attrs = json.loads(event_data["attrs_json"])
-                assert "beat_number" in attrs
-                assert "interval" in attrs
-                assert attrs["interval"] == 1.0
-
-    def test_run_dry_run_custom_duration(self):
+        for event_data in events:
+            assert "id" in event_data
+            assert "ts_utc" in event_data
+            assert event_data["monitor"] == "heartbeat"
+            assert event_data["action"] == "heartbeat"
+            assert event_data["subject_type"] == "none"
+            assert "session_id" in event_data
+            assert "attrs_json" in event_data
+
+            # Check attrs_json content
+            attrs = json.loads(event_data["attrs_json"])
+            assert "beat_number" in attrs
+            assert "interval" in attrs
+            assert attrs["interval"] == 1.0
+
+    def test_run_dry_run_custom_duration(self, run_clock, runner):
         """Test dry-run with custom duration."""
-        runner = CliRunner()
-
-        # Test with very short duration
-        start_time = time.time()
-        result = runner.invoke(app, ["run", "--dry-run", "--duration", "1"])
-        end_time = time.time()
+        # Two beats one interval apart; elapsed time is read off the fake clock
+        start_time = run_clock()
+        result = runner.invoke(_CLI, ["run", "--dry-run", "--duration", "2"])
+        end_time = run_clock()
 
         assert result.exit_code == 0
 
-        # Should complete in roughly the specified duration + some buffer
-        elapsed = end_time - start_time
-        assert 1.0 <= elapsed <= 3.0  # Allow some buffer for startup/cleanup
+        # The first beat fires on start, so two beats span one interval wait;
+        # nothing else moves the clock
+        assert end_time - start_time == 1.0
 
-    def test_run_dry_run_event_ordering(self):
+    def test_run_dry_run_event_ordering(self, run_clock, runner):
         """Test that events are printed in correct order."""
-        runner = CliRunner()
-        result = runner.invoke(app, ["run", "--dry-run", "--duration", "3"])
+        result = runner.invoke(_CLI, ["run", "--dry-run", "--duration", "3"])
 
         assert result.exit_code == 0
 
         # Extract beat numbers from events
-        lines = result.output.split("\\n")
-        beat_numbers = []
-
-        for line in lines:
-            if "[heartbeat] heartbeat at" in line:
-                json_start = line.find("{")
-                if json_start != -1:
-                    json_str = line[json_start:]
-                    try:
-                        event_data = json.loads(json_str)
-                        attrs = json.loads(event_data["attrs_json"])
-                        beat_numbers.append(attrs["beat_number"])
-                    except (json.JSONDecodeError, KeyError):
-                        pass
+        beat_numbers = [
+            json.loads(event["attrs_json"])["beat_number"]
+            for event in _heartbeat_events(result.output)
+        ]
 
         # Should have at least 2 beats in 3 seconds
         assert len(beat_numbers) >= 2
@@ -119,91 +151,104 @@ class TestCliRun:
         for i, beat_num in enumerate(beat_numbers):
             assert beat_num == i + 1
 
-    @patch("lb3.cli.get_event_bus")
-    @patch("lb3.cli.SpoolerSink")
-    def test_run_normal_mode_setup(self, mock_spooler_sink, mock_get_bus):
+    @patch("lb3.spooler.get_spooler_manager")
+    @patch("lb3.supervisor.get_event_bus")
+    @patch("lb3.supervisor.SpoolerSink")
+    def test_run_normal_mode_setup(
+        self, mock_spooler_sink, mock_get_bus, mock_get_manager, runner
+    ):
         """Test that normal mode sets up event bus and spooler correctly."""
         mock_bus = mock_get_bus.return_value
         mock_sink = mock_spooler_sink.return_value
 
-        runner = CliRunner()
-
-        # Use timeout to avoid infinite run
-        with patch("signal.signal"):  # Mock signal handling
-            with patch(
-                "time.sleep", side_effect=KeyboardInterrupt
-            ):  # Interrupt quickly
-                runner.invoke(app, ["run"])
+        # Interrupt the wait as Ctrl+C would, so the run shuts down at once
+        with (
+            patch("signal.signal"),
+            patch(
+                "lb3.supervisor.MonitorSupervisor.wait_until_shutdown",
+                side_effect=KeyboardInterrupt,
+            ),
+        ):
+            runner.invoke(_CLI, ["run"])
 
         # Should have started bus and added sink
         mock_bus.start.assert_called_once()
         mock_bus.subscribe.assert_called_once_with(mock_sink)
         mock_bus.stop.assert_called_once()
 
-    def test_run_error_handling(self):
-        """Test error handling in run command."""
-        runner = CliRunner()
+    def test_run_duration_zero_is_unbounded(self, runner):
+        """Test that --duration 0 gives a dry-run heartbeat with no beat limit."""
+        from lb3.supervisor import create_standard_supervisor
 
-        # Test with invalid duration (should still work as it defaults)
-        result = runner.invoke(app, ["run", "--dry-run", "--duration", "0"])
+        with patch("lb3.supervisor.create_standard_supervisor") as mock_create:
+            result = runner.invoke(_CLI, ["run", "--dry-run", "--duration", "0"])
 
-        # Even with 0 duration, should start but finish quickly
         assert result.exit_code == 0
-        assert "[DRY-RUN]" in result.output
+        mock_create.assert_called_once_with(dry_run=True, verbose=False, duration=0)
 
-    def test_run_creates_spool_files(self):
+        # Zero means run until interrupted, not stop after zero beats
+        supervisor = create_standard_supervisor(dry_run=True, duration=0)
+        heartbeat = supervisor._monitor_status["heartbeat"]["monitor"]
+        assert heartbeat.total_beats == 0
+
+    def test_run_creates_spool_files(self, tmp_path, runner):
         """Test that normal run creates spool files."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Mock config to use temp directory
-            with patch("lb3.config.Config.get_config_path") as mock_path:
-                config_path = Path(temp_dir) / "config.yaml"
-                mock_path.return_value = config_path
-
-                # Create minimal config
-                config_content = f"""
+        # Mock config to use the test's temp directory
+        with patch("lb3.config.Config.get_config_path") as mock_path:
+            config_path = tmp_path / "config.yaml"
+            mock_path.return_value = config_path
+
+            # Create minimal config
+            config_content = f"""
 time_zone_handling: "UTC_store_only"
 storage:
-  sqlite_path: "{temp_dir}/local.db"
-  spool_dir: "{temp_dir}/spool"
+  sqlite_path: "{tmp_path}/local.db"
+  spool_dir: "{tmp_path}/spool"
 """
 
-                config_path.parent.mkdir(parents=True, exist_ok=True)
-                config_path.write_text(config_content)
-
-                runner = CliRunner()
+            config_path.write_text(config_content)
 
-                # Run for short time with timeout
-                with patch("time.sleep") as mock_sleep:
-                    # Make sleep raise KeyboardInterrupt after first call
-                    mock_sleep.side_effect = [None, KeyboardInterrupt()]
+            # Run for short time with timeout
+            with patch("time.sleep") as mock_sleep:
+                # Make sleep raise KeyboardInterrupt after first call
+                mock_sleep.side_effect = [None, KeyboardInterrupt()]
 
-                    result = runner.invoke(app, ["run"])
+                result = runner.invoke(_CLI, ["run"])
 
-                # Should have started successfully
-                assert "Starting monitoring system" in result.output
+            # Should have started successfully
+            assert "Starting monitoring system" in result.output
 
-                # Check if spool directory structure was created
-                spool_dir = Path(temp_dir) / "spool" / "heartbeat"
-                assert spool_dir.exists(), f"Spool directory not created: {spool_dir}"
+            # Check if spool directory structure was created
+            spool_dir = tmp_path / "spool" / "heartbeat"
+            assert spool_dir.exists(), f"Spool directory not created: {spool_dir}"
 
-    def test_run_version_accessible(self):
+    def test_run_version_accessible(self, runner):
         """Test that version command works alongside run."""
-        runner = CliRunner()
-        result = runner.invoke(app, ["version"])
+        result = runner.invoke(_CLI.commands["version"])
 
         assert result.exit_code == 0
         assert "Little Brother v3" in result.output
 
-    def test_run_with_config_show(self):
+    def test_run_with_config_show(self, runner):
         """Test that config commands work alongside run."""
-        runner = CliRunner()
-        result = runner.invoke(app, ["config", "show"])
+        result = runner.invoke(_CLI.commands["config"], ["show"])
 
         assert result.exit_code == 0
         # Should show YAML config
         assert "time_zone_handling:" in result.output or "storage:" in result.output
 
 
+@pytest.fixture(scope="module")
+def shared_bus():
+    """Global event bus, started once for the module's heartbeat tests."""
+    from lb3.events import get_event_bus
+
+    bus = get_event_bus()
+    bus.start()
+    yield bus
+    bus.stop()
+
+
 class TestHeartbeatMonitorIntegration:
     """Test HeartbeatMonitor integration through CLI."""
 
@@ -229,10 +274,8 @@ class TestHeartbeatMonitorIntegration:
         monitor.start()
         assert monitor._running
 
-        # Wait for monitor to complete
-        start_time = time.time()
-        while monitor._running and (time.time() - start_time) < 5:
-            time.sleep(0.1)
+        # Wait for the run loop to finish its beats
+        assert monitor.join(timeout=5)
 
         monitor.stop()
         assert not monitor._running
@@ -253,6 +296,16 @@ class TestHeartbeatMonitorIntegration:
 
         monitor = HeartbeatMonitor(dry_run=True, interval=1.0, total_beats=5)
 
+        # Signal the first beat instead of sleeping past it
+        first_beat = threading.Event()
+        emit_heartbeat = monitor._emit_heartbeat
+
+        def emit_and_signal():
+            emit_heartbeat()
+            first_beat.set()
+
+        monitor._emit_heartbeat = emit_and_signal
+
         # Initial stats
         stats = monitor.get_stats()
         assert stats["name"] == "heartbeat"
@@ -267,8 +320,8 @@ class TestHeartbeatMonitorIntegration:
         stats = monitor.get_stats()
         assert stats["is_running"] is True
 
-        # Let it run briefly
-        time.sleep(1.5)
+        # Wait for the first beat
+        assert first_beat.wait(2.0)
 
         stats = monitor.get_stats()
         assert stats["beat_count"] >= 1
@@ -279,36 +332,37 @@ class TestHeartbeatMonitorIntegration:
         stats = monitor.get_stats()
         assert stats["is_running"] is False
 
-    def test_event_bus_integration_with_heartbeat(self):
+    def test_event_bus_integration_with_heartbeat(self, shared_bus):
         """Test event bus integration with heartbeat monitor."""
-        from lb3.events import get_event_bus
         from lb3.monitors.heartbeat import HeartbeatMonitor
 
-        bus = get_event_bus()
         received_events = []
+        received_two = threading.Event()
 
         def event_handler(event):
+            # The bus is shared, so ignore events from other tests' monitors
+            if event.monitor != "heartbeat":
+                return
             received_events.append(event)
+            if len(received_events) >= 2:
+                received_two.set()
 
-        bus.subscribe(event_handler)
-        bus.start()
+        shared_bus.subscribe(event_handler)
 
         # Create monitor that publishes to event bus
         monitor = HeartbeatMonitor(dry_run=False, interval=0.5, total_beats=2)
 
         monitor.start()
 
-        # Wait for completion
-        start_time = time.time()
-        while monitor._running and (time.time() - start_time) < 5:
-            time.sleep(0.1)
+        # Wait for the run loop to finish its beats
+        assert monitor.join(timeout=5)
 
         monitor.stop()
 
-        # Give event bus time to process
-        time.sleep(0.2)
+        # Return as soon as the bus has delivered both beats
+        assert received_two.wait(5)
 
-        bus.stop()
+        shared_bus.unsubscribe(event_handler)
 
         # Should have received events through bus
         assert len(received_events) >= 2
@@ -3,20 +3,62 @@
 import os
 import signal
 import subprocess
+import sys
 import tempfile
 import time
 from pathlib import Path
 
 import pytest
+from typer.testing import CliRunner
 
+from lb3.cli import app
 from lb3.database import Database
 
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
+
+def _child_env(config_dir: Path) -> dict[str, str]:
+    """Environment for lb3 child processes pointed at a test config dir."""
+    env = os.environ.copy()
+    env["LB3_CONFIG_DIR"] = str(config_dir)
+    # Skip .pyc writes and flush child logs as they are produced
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    env["PYTHONUNBUFFERED"] = "1"
+    # Keep user site-packages out of the child's startup
+    env["PYTHONNOUSERSITE"] = "1"
+    return env
+
+
+@pytest.fixture
+def managed_popen():
+    """Popen wrapper that reaps every child still running at teardown."""
+    processes = []
+
+    def spawn(*args, **kwargs):
+        process = subprocess.Popen(*args, **kwargs)
+        processes.append(process)
+        return process
+
+    yield spawn
+
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+@pytest.mark.integration
 @pytest.mark.usefixtures("no_thread_leaks")
 class TestCliRunIntegration:
     """Integration tests for CLI run command lifecycle."""
 
-    def test_run_command_full_lifecycle_graceful_shutdown(self):
+    def test_run_command_full_lifecycle_graceful_shutdown(
+        self, monkeypatch, managed_popen
+    ):
         """Test full run command lifecycle: start monitors, verify activity, graceful shutdown."""
         with tempfile.TemporaryDirectory() as temp_dir:
             # Set up temporary environment
@@ -50,172 +92,172 @@ monitors:
                 f.write(config_content)
 
             # Set environment variables for config discovery
-            env = os.environ.copy()
-            env["LB3_CONFIG_DIR"] = str(config_dir)
-
-            try:
-                # Start lb3 run command in subprocess
-                print("\nStarting lb3 run command...")
-                start_time = time.time()
-
-                process = subprocess.Popen(
-                    ["python", "-m", "lb3", "run", "--verbose"],
+            env = _child_env(config_dir)
+
+            # The child writes its output straight to files, so a full pipe
+            # buffer can never block it while verbose logs pile up
+            stdout_log = Path(temp_dir) / "run.stdout"
+            stderr_log = Path(temp_dir) / "run.stderr"
+
+            # Start lb3 run command in subprocess
+            print("\nStarting lb3 run command...")
+            start_time = time.time()
+
+            with open(stdout_log, "w") as stdout_file, open(
+                stderr_log, "w"
+            ) as stderr_file:
+                process = managed_popen(
+                    [sys.executable, "-m", "lb3", "run", "--verbose"],
                     env=env,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
+                    stdout=stdout_file,
+                    stderr=stderr_file,
                     text=True,
-                    cwd=Path(__file__).parent.parent.parent,  # Project root
+                    cwd=_PROJECT_ROOT,
                 )
 
-                # Let it run for 10 seconds to accumulate events
-                print("Letting monitors run for 10 seconds...")
-                time.sleep(10)
+            # Let monitors start, then stop as soon as a journal is
+            # written, giving up on waiting after 10 seconds
+            print("Waiting for the first journal file (max 10 seconds)...")
+            time.sleep(1.0)
+            deadline = time.monotonic() + 9.0
+            while time.monotonic() < deadline:
+                if any(spool_dir.rglob("*.ndjson.gz")):
+                    break
+                time.sleep(0.1)
+
+            # Send SIGINT for graceful shutdown
+            print("Sending SIGINT for graceful shutdown...")
+            if os.name == "nt":  # Windows
+                process.send_signal(signal.CTRL_C_EVENT)
+            else:  # Unix-like
+                process.send_signal(signal.SIGINT)
+
+            # Wait for graceful shutdown with timeout
+            try:
+                return_code = process.wait(timeout=15)
+                stdout = stdout_log.read_text()
+                stderr = stderr_log.read_text()
+                runtime = time.time() - start_time
+
+                print(f"Process completed with return code: {return_code}")
+                print(f"Runtime: {runtime:.2f}s")
 
-                # Send SIGINT for graceful shutdown
-                print("Sending SIGINT for graceful shutdown...")
-                if os.name == "nt":  # Windows
-                    process.send_signal(signal.CTRL_C_EVENT)
-                else:  # Unix-like
-                    process.send_signal(signal.SIGINT)
+                # Verify graceful shutdown (exit code 0)
+                assert (
+                    return_code == 0
+                ), f"Process should exit cleanly, got code {return_code}"
+
+                # Check output for expected messages
+                output_lines = stdout.split("\n")
+                assert any(
+                    "Starting monitoring system..." in line for line in output_lines
+                ), "Should show startup message"
+                assert any(
+                    "Shutting down gracefully..." in line
+                    or "graceful shutdown" in line.lower()
+                    for line in output_lines
+                ), "Should show graceful shutdown message"
+
+                # Should not have stack traces or unhandled exceptions in stderr
+                error_lines = stderr.split("\n")
+                critical_errors = [
+                    line
+                    for line in error_lines
+                    if "Traceback" in line or "Exception:" in line
+                ]
+                if critical_errors:
+                    print(
+                        f"Warning: Found potential errors in stderr: {critical_errors[:3]}"
+                    )
 
-                # Wait for graceful shutdown with timeout
-                try:
-                    stdout, stderr = process.communicate(timeout=15)
-                    return_code = process.returncode
-                    runtime = time.time() - start_time
+                # Verify events were written to spool directory
+                print("Checking spool directory for events...")
+                monitor_dirs = [
+                    d
+                    for d in spool_dir.iterdir()
+                    if d.is_dir() and not d.name.startswith("_")
+                ]
+                assert (
+                    len(monitor_dirs) > 0
+                ), "Should have created monitor directories in spool"
+
+                total_files = 0
+                for monitor_dir in monitor_dirs:
+                    journal_files = list(monitor_dir.glob("*.ndjson.gz"))
+                    total_files += len(journal_files)
+                    print(
+                        f"  {monitor_dir.name}: {len(journal_files)} journal files"
+                    )
 
-                    print(f"Process completed with return code: {return_code}")
-                    print(f"Runtime: {runtime:.2f}s")
+                spool_listing = sorted(
+                    str(path.relative_to(spool_dir)) for path in spool_dir.rglob("*")
+                )
+                assert total_files > 0, (
+                    "No journal files appeared within the 10s poll timeout or "
+                    f"after shutdown; spool contents: {spool_listing}"
+                )
 
-                    # Verify graceful shutdown (exit code 0)
-                    assert (
-                        return_code == 0
-                    ), f"Process should exit cleanly, got code {return_code}"
-
-                    # Check output for expected messages
-                    output_lines = stdout.split("\n")
-                    assert any(
-                        "Starting monitoring system..." in line for line in output_lines
-                    ), "Should show startup message"
-                    assert any(
-                        "Shutting down gracefully..." in line
-                        or "graceful shutdown" in line.lower()
-                        for line in output_lines
-                    ), "Should show graceful shutdown message"
-
-                    # Should not have stack traces or unhandled exceptions in stderr
-                    error_lines = stderr.split("\n")
-                    critical_errors = [
-                        line
-                        for line in error_lines
-                        if "Traceback" in line or "Exception:" in line
-                    ]
-                    if critical_errors:
-                        print(
-                            f"Warning: Found potential errors in stderr: {critical_errors[:3]}"
-                        )
-
-                    # Verify events were written to spool directory
-                    print("Checking spool directory for events...")
-                    monitor_dirs = [
-                        d
-                        for d in spool_dir.iterdir()
-                        if d.is_dir() and not d.name.startswith("_")
-                    ]
-                    assert (
-                        len(monitor_dirs) > 0
-                    ), "Should have created monitor directories in spool"
+                # Flush and status only need the spool on disk, so run them
+                # in-process from the same working directory as the child
+                monkeypatch.chdir(_PROJECT_ROOT)
+                runner = CliRunner()
 
-                    total_files = 0
-                    for monitor_dir in monitor_dirs:
-                        journal_files = list(monitor_dir.glob("*.ndjson.gz"))
-                        total_files += len(journal_files)
-                        print(
-                            f"  {monitor_dir.name}: {len(journal_files)} journal files"
-                        )
+                # Flush events to database and verify
+                print("Flushing events to database...")
+                flush_result = runner.invoke(app, ["spool", "flush"], env=env)
 
-                    assert (
-                        total_files > 0
-                    ), "Should have created journal files during 10s run"
-
-                    # Flush events to database and verify
-                    print("Flushing events to database...")
-                    flush_process = subprocess.run(
-                        ["python", "-m", "lb3", "spool", "flush"],
-                        env=env,
-                        capture_output=True,
-                        text=True,
-                        cwd=Path(__file__).parent.parent.parent,
+                assert (
+                    flush_result.exit_code == 0
+                ), f"Spool flush should succeed: {flush_result.output}"
+
+                # Verify database has events
+                if db_path.exists():
+                    db = Database(db_path)
+                    try:
+                        counts = db.get_table_counts()
+                        events_count = counts.get("events", 0)
+                        print(f"Database contains {events_count} events")
+                        assert (
+                            events_count > 0
+                        ), "Database should contain events after flush"
+                    finally:
+                        db.close()
+                else:
+                    print("Warning: Database file was not created")
+
+                # Test status command shows recent activity
+                print("Testing status command...")
+                status_result = runner.invoke(app, ["status", "--verbose"], env=env)
+
+                if status_result.exit_code == 0:
+                    status_output = status_result.stdout
+                    print(
+                        "Status output preview:",
+                        status_output[:200] + "..."
+                        if len(status_output) > 200
+                        else status_output,
                     )
-
                     assert (
-                        flush_process.returncode == 0
-                    ), f"Spool flush should succeed: {flush_process.stderr}"
-
-                    # Verify database has events
-                    if db_path.exists():
-                        db = Database(db_path)
-                        try:
-                            counts = db.get_table_counts()
-                            events_count = counts.get("events", 0)
-                            print(f"Database contains {events_count} events")
-                            assert (
-                                events_count > 0
-                            ), "Database should contain events after flush"
-                        finally:
-                            db.close()
-                    else:
-                        print("Warning: Database file was not created")
-
-                    # Test status command shows recent activity
-                    print("Testing status command...")
-                    status_process = subprocess.run(
-                        ["python", "-m", "lb3", "status", "--verbose"],
-                        env=env,
-                        capture_output=True,
-                        text=True,
-                        cwd=Path(__file__).parent.parent.parent,
-                    )
+                        "Monitor status:" in status_output
+                    ), "Status should show monitor information"
+                else:
+                    print(f"Status command failed: {status_result.output}")
+
+                print("\n[SUCCESS] Full lifecycle test completed successfully")
+                print(f"✓ Graceful startup and shutdown (exit code {return_code})")
+                print(f"✓ Events written to {total_files} journal files")
+                print(f"✓ Runtime: {runtime:.1f}s")
+                if "events_count" in locals():
+                    print(f"✓ {events_count} events imported to database")
 
-                    if status_process.returncode == 0:
-                        status_output = status_process.stdout
-                        print(
-                            "Status output preview:",
-                            status_output[:200] + "..."
-                            if len(status_output) > 200
-                            else status_output,
-                        )
-                        assert (
-                            "Monitor status:" in status_output
-                        ), "Status should show monitor information"
-                    else:
-                        print(f"Status command failed: {status_process.stderr}")
-
-                    print("\n[SUCCESS] Full lifecycle test completed successfully")
-                    print(f"✓ Graceful startup and shutdown (exit code {return_code})")
-                    print(f"✓ Events written to {total_files} journal files")
-                    print(f"✓ Runtime: {runtime:.1f}s")
-                    if "events_count" in locals():
-                        print(f"✓ {events_count} events imported to database")
-
-                except subprocess.TimeoutExpired:
-                    # Force kill if graceful shutdown took too long
-                    print("Graceful shutdown timeout, force killing process...")
-                    process.kill()
-                    stdout, stderr = process.communicate()
-                    pytest.fail("Process did not shutdown gracefully within timeout")
-
-            except Exception as e:
-                # Clean up process if test fails
-                try:
-                    if process.poll() is None:
-                        process.terminate()
-                        process.wait(timeout=5)
-                except Exception:
-                    pass
-                raise e
-
-    def test_dry_run_mode_no_file_writes(self):
+            except subprocess.TimeoutExpired:
+                # Force kill if graceful shutdown took too long
+                print("Graceful shutdown timeout, force killing process...")
+                process.kill()
+                process.wait()
+                pytest.fail("Process did not shutdown gracefully within timeout")
+
+    def test_dry_run_mode_no_file_writes(self, managed_popen):
         """Test dry-run mode prints events without writing files."""
         with tempfile.TemporaryDirectory() as temp_dir:
             config_dir = Path(temp_dir) / "config"
@@ -236,22 +278,29 @@ storage:
             with open(config_file, "w") as f:
                 f.write(config_content)
 
-            env = os.environ.copy()
-            env["LB3_CONFIG_DIR"] = str(config_dir)
+            env = _child_env(config_dir)
 
             try:
-                # Run in dry-run mode for 5 seconds
+                # Run in dry-run mode for 1 second; events print immediately
                 print("\nTesting dry-run mode...")
-                process = subprocess.Popen(
-                    ["python", "-m", "lb3", "run", "--dry-run", "--duration", "5"],
+                process = managed_popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "lb3",
+                        "run",
+                        "--dry-run",
+                        "--duration",
+                        "1",
+                    ],
                     env=env,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     text=True,
-                    cwd=Path(__file__).parent.parent.parent,
+                    cwd=_PROJECT_ROOT,
                 )
 
-                stdout, stderr = process.communicate(timeout=30)
+                stdout, stderr = process.communicate(timeout=10)
 
                 # Should exit cleanly after duration
                 assert process.returncode == 0, f"Dry-run should exit cleanly: {stderr}"
@@ -289,7 +338,6 @@ storage:
                 print("✓ No journal files created (as expected)")
 
             except subprocess.TimeoutExpired:
-                process.kill()
                 pytest.fail("Dry-run process did not complete within expected time")
 
     def test_version_and_status_commands(self):
@@ -311,17 +359,16 @@ storage:
             with open(config_file, "w") as f:
                 f.write(config_content)
 
-            env = os.environ.copy()
-            env["LB3_CONFIG_DIR"] = str(config_dir)
+            env = _child_env(config_dir)
 
             # Test version command
             print("\nTesting version command...")
             version_result = subprocess.run(
-                ["python", "-m", "lb3", "version"],
+                [sys.executable, "-m", "lb3", "version"],
                 env=env,
                 capture_output=True,
                 text=True,
-                cwd=Path(__file__).parent.parent.parent,
+                cwd=_PROJECT_ROOT,
             )
 
             assert (
@@ -335,11 +382,11 @@ storage:
             # Test status command (should handle empty database gracefully)
             print("Testing status command...")
             status_result = subprocess.run(
-                ["python", "-m", "lb3", "status"],
+                [sys.executable, "-m", "lb3", "status"],
                 env=env,
                 capture_output=True,
                 text=True,
-                cwd=Path(__file__).parent.parent.parent,
+                cwd=_PROJECT_ROOT,
             )
 
             # Status may fail if no database exists yet, but should not crash
@@ -1,22 +1,56 @@
 """Integration tests for config CLI commands."""
 
-import subprocess
-import tempfile
 from pathlib import Path
 
+import pytest
 import yaml
+from typer.testing import CliRunner
 
+from lb3.cli import app
 
+# Lines of the default config file and the user edits that replace them
+_USER_EDITS = {
+    "sqlite_path: ./lb_data/local.db\n": "sqlite_path: ./custom/database.db\n",
+    "enabled: []\n": "enabled:\n  - custom_plugin\n",
+    "chrome_remote_debug_port: 0\n": "chrome_remote_debug_port: 9222\n",
+}
+
+
+@pytest.fixture(scope="module")
+def runner():
+    """CLI runner with stdout kept separate from log output on stderr."""
+    return CliRunner(mix_stderr=False)
+
+
+@pytest.fixture(scope="session")
+def default_config_bytes(tmp_path_factory):
+    """Config file written by a first-run config show, generated once per session."""
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem(temp_dir=tmp_path_factory.mktemp("seed")):
+        result = runner.invoke(app, ["config", "show"])
+        assert result.exit_code == 0
+        return Path("lb_data/config.yaml").read_bytes()
+
+
+@pytest.fixture
+def seeded_config(runner, default_config_bytes):
+    """Isolated working directory pre-seeded with the default config file."""
+    with runner.isolated_filesystem() as temp_dir:
+        config_file = Path(temp_dir) / "lb_data" / "config.yaml"
+        config_file.parent.mkdir()
+        config_file.write_bytes(default_config_bytes)
+        yield config_file
+
+
+@pytest.mark.integration
 class TestConfigCLI:
     """Integration tests for config CLI functionality."""
 
-    def test_config_path_command(self):
+    def test_config_path_command(self, runner):
         """Test lb3 config path returns correct path."""
-        result = subprocess.run(
-            ["lb3", "config", "path"], capture_output=True, text=True, timeout=30
-        )
+        result = runner.invoke(app, ["config", "path"])
 
-        assert result.returncode == 0
+        assert result.exit_code == 0
         path_output = result.stdout.strip()
 
         # Should be absolute path ending with config.yaml
@@ -24,208 +58,116 @@ class TestConfigCLI:
         assert path_output.endswith("config.yaml")
         assert "lb_data" in path_output
 
-    def test_config_show_command_first_run(self):
+    def test_config_show_command_first_run(self, runner):
         """Test lb3 config show creates config and shows YAML."""
         # Use a temporary directory to simulate fresh environment
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Change to temp directory for isolated test
-            original_cwd = Path.cwd()
+        with runner.isolated_filesystem() as temp_dir:
             temp_path = Path(temp_dir)
 
-            try:
-                # Change working directory to temp
-                import os
-
-                os.chdir(temp_path)
-
-                result = subprocess.run(
-                    ["lb3", "config", "show"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    cwd=str(temp_path),
-                )
-
-                assert result.returncode == 0
-                yaml_output = result.stdout
-
-                # Parse YAML output
-                config_data = yaml.safe_load(yaml_output)
-
-                # Verify all required keys are present
-                assert config_data["time_zone_handling"] == "UTC_store_only"
-                assert config_data["storage"]["sqlite_path"] == "./lb_data/local.db"
-                assert config_data["storage"]["spool_dir"] == "./lb_data/spool"
-                assert config_data["identifiers"]["type"] == "ULID"
-                assert config_data["guardrails"]["no_global_text_keylogging"] is True
-                assert config_data["plugins"]["enabled"] == []
-                assert (
-                    config_data["browser"]["integration"]["disabled_by_default"] is True
-                )
-                assert (
-                    config_data["browser"]["integration"]["chrome_remote_debug_port"]
-                    == 0
-                )
-                assert (
-                    config_data["heartbeat"]["poll_intervals"]["active_window"]
-                    == "1.2s"
-                )
-                assert config_data["heartbeat"]["poll_intervals"]["browser"] == "2.0s"
-                assert (
-                    config_data["heartbeat"]["poll_intervals"]["context_idle_gap"]
-                    == "7.0s"
-                )
-                assert (
-                    config_data["batch"]["flush_thresholds"]["keyboard_events"]
-                    == "128 or 1.5s"
-                )
-                assert (
-                    config_data["batch"]["flush_thresholds"]["mouse_events"]
-                    == "64 or 1.5s"
-                )
-
-                # Verify hashing salt is present and valid
-                assert "hashing" in config_data
-                assert "salt" in config_data["hashing"]
-                salt = config_data["hashing"]["salt"]
-                assert isinstance(salt, str)
-                assert len(salt) == 64  # 32 bytes as hex
-                int(salt, 16)  # Should be valid hex
-
-                # Verify config file was created
-                config_file = temp_path / "lb_data" / "config.yaml"
-                assert config_file.exists()
-
-            finally:
-                os.chdir(original_cwd)
-
-    def test_config_show_salt_persistence(self):
+            result = runner.invoke(app, ["config", "show"])
+
+            assert result.exit_code == 0
+            yaml_output = result.stdout
+
+            # Parse YAML output
+            config_data = yaml.safe_load(yaml_output)
+
+            # Verify all required keys are present
+            assert config_data["time_zone_handling"] == "UTC_store_only"
+            assert config_data["storage"]["sqlite_path"] == "./lb_data/local.db"
+            assert config_data["storage"]["spool_dir"] == "./lb_data/spool"
+            assert config_data["identifiers"]["type"] == "ULID"
+            assert config_data["guardrails"]["no_global_text_keylogging"] is True
+            assert config_data["plugins"]["enabled"] == []
+            assert config_data["browser"]["integration"]["disabled_by_default"] is True
+            assert (
+                config_data["browser"]["integration"]["chrome_remote_debug_port"] == 0
+            )
+            assert config_data["heartbeat"]["poll_intervals"]["active_window"] == "1.2s"
+            assert config_data["heartbeat"]["poll_intervals"]["browser"] == "2.0s"
+            assert (
+                config_data["heartbeat"]["poll_intervals"]["context_idle_gap"] == "7.0s"
+            )
+            assert (
+                config_data["batch"]["flush_thresholds"]["keyboard_events"]
+                == "128 or 1.5s"
+            )
+            assert (
+                config_data["batch"]["flush_thresholds"]["mouse_events"] == "64 or 1.5s"
+            )
+
+            # Verify hashing salt is present and valid
+            assert "hashing" in config_data
+            assert "salt" in config_data["hashing"]
+            salt = config_data["hashing"]["salt"]
+            assert isinstance(salt, str)
+            assert len(salt) == 64  # 32 bytes as hex
+            int(salt, 16)  # Should be valid hex
+
+            # Verify config file was created
+            config_file = temp_path / "lb_data" / "config.yaml"
+            assert config_file.exists()
+
+    def test_config_show_salt_persistence(self, runner):
         """Test that salt persists between config show commands."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            original_cwd = Path.cwd()
-            temp_path = Path(temp_dir)
+        with runner.isolated_filesystem():
+            # First run
+            result1 = runner.invoke(app, ["config", "show"])
 
-            try:
-                import os
+            assert result1.exit_code == 0
+            config_data1 = yaml.safe_load(result1.stdout)
+            salt1 = config_data1["hashing"]["salt"]
 
-                os.chdir(temp_path)
+            # Second run
+            result2 = runner.invoke(app, ["config", "show"])
 
-                # First run
-                result1 = subprocess.run(
-                    ["lb3", "config", "show"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    cwd=str(temp_path),
-                )
+            assert result2.exit_code == 0
+            config_data2 = yaml.safe_load(result2.stdout)
+            salt2 = config_data2["hashing"]["salt"]
 
-                assert result1.returncode == 0
-                config_data1 = yaml.safe_load(result1.stdout)
-                salt1 = config_data1["hashing"]["salt"]
+            # Salt should be identical
+            assert salt1 == salt2
 
-                # Second run
-                result2 = subprocess.run(
-                    ["lb3", "config", "show"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    cwd=str(temp_path),
-                )
-
-                assert result2.returncode == 0
-                config_data2 = yaml.safe_load(result2.stdout)
-                salt2 = config_data2["hashing"]["salt"]
-
-                # Salt should be identical
-                assert salt1 == salt2
-
-            finally:
-                os.chdir(original_cwd)
-
-    def test_config_show_respects_user_edits(self):
+    def test_config_show_respects_user_edits(self, runner, seeded_config):
         """Test that config show respects manual edits to config file."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            original_cwd = Path.cwd()
-            temp_path = Path(temp_dir)
+        # Start from the config a first run would have created
+        original_text = seeded_config.read_text()
+
+        # Change some values by editing their lines in place
+        edited_text = original_text
+        for old, new in _USER_EDITS.items():
+            assert old in edited_text
+            edited_text = edited_text.replace(old, new, 1)
+        seeded_config.write_text(edited_text)
+
+        # Run config show against the edited file
+        result = runner.invoke(app, ["config", "show"])
+
+        assert result.exit_code == 0
+        modified_config = yaml.safe_load(result.stdout)
+
+        # Verify our changes were preserved
+        assert modified_config["storage"]["sqlite_path"] == "./custom/database.db"
+        assert modified_config["plugins"]["enabled"] == ["custom_plugin"]
+        assert (
+            modified_config["browser"]["integration"]["chrome_remote_debug_port"]
+            == 9222
+        )
+
+        # Salt should remain the same
+        assert f"salt: {modified_config['hashing']['salt']}\n" in original_text
 
-            try:
-                import os
-
-                os.chdir(temp_path)
-
-                # First run to create config
-                result1 = subprocess.run(
-                    ["lb3", "config", "show"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    cwd=str(temp_path),
-                )
-
-                assert result1.returncode == 0
-                original_config = yaml.safe_load(result1.stdout)
-
-                # Manually edit config file
-                config_file = temp_path / "lb_data" / "config.yaml"
-                with open(config_file) as f:
-                    config_data = yaml.safe_load(f)
-
-                # Change some values
-                config_data["storage"]["sqlite_path"] = "./custom/database.db"
-                config_data["plugins"]["enabled"] = ["custom_plugin"]
-                config_data["browser"]["integration"]["chrome_remote_debug_port"] = 9222
-
-                with open(config_file, "w") as f:
-                    yaml.dump(config_data, f, default_flow_style=False)
-
-                # Run config show again
-                result2 = subprocess.run(
-                    ["lb3", "config", "show"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    cwd=str(temp_path),
-                )
-
-                assert result2.returncode == 0
-                modified_config = yaml.safe_load(result2.stdout)
-
-                # Verify our changes were preserved
-                assert (
-                    modified_config["storage"]["sqlite_path"] == "./custom/database.db"
-                )
-                assert modified_config["plugins"]["enabled"] == ["custom_plugin"]
-                assert (
-                    modified_config["browser"]["integration"][
-                        "chrome_remote_debug_port"
-                    ]
-                    == 9222
-                )
-
-                # Salt should remain the same
-                assert (
-                    modified_config["hashing"]["salt"]
-                    == original_config["hashing"]["salt"]
-                )
-
-            finally:
-                os.chdir(original_cwd)
-
-    def test_config_commands_in_help(self):
+    def test_config_commands_in_help(self, runner):
         """Test that config commands appear in help."""
         # Test main help
-        result = subprocess.run(
-            ["lb3", "--help"], capture_output=True, text=True, timeout=30
-        )
+        result = runner.invoke(app, ["--help"])
 
-        assert result.returncode == 0
+        assert result.exit_code == 0
         assert "config" in result.stdout
 
         # Test config subcommand help
-        result = subprocess.run(
-            ["lb3", "config", "--help"], capture_output=True, text=True, timeout=30
-        )
+        result = runner.invoke(app, ["config", "--help"])
 
-        assert result.returncode == 0
+        assert result.exit_code == 0
         assert "show" in result.stdout
         assert "path" in result.stdout
@@ -1,5 +1,6 @@
 """Tests for database module."""
 
+import sqlite3
 import tempfile
 import time
 from pathlib import Path
@@ -28,6 +29,46 @@ class TestDatabase:
 
             db.close()
 
+    def test_in_memory_database(self):
+        """Test that an in-memory database is initialized without touching disk."""
+        db = Database(":memory:")
+
+        assert db.in_memory is True
+
+        health = db.health_check()
+        assert health["status"] == "healthy"
+        assert len(health["tables_missing"]) == 0
+
+        event = create_test_event()
+        db.insert_event(event)
+        assert db.get_table_counts()["events"] == 1
+
+        db.close()
+
+    def test_copy_to_memory(self):
+        """Test that an in-memory copy has the schema and data but is independent."""
+        source = Database(":memory:")
+        source.insert_event(create_test_event())
+
+        copy = source.copy_to_memory()
+        assert copy.in_memory is True
+        assert copy.get_table_counts()["events"] == 1
+
+        copy.insert_event(create_test_event())
+        assert copy.get_table_counts()["events"] == 2
+        assert source.get_table_counts()["events"] == 1
+
+        copy.close()
+        source.close()
+
+    def test_closed_in_memory_database_does_not_reconnect(self):
+        """Test that a closed in-memory database raises instead of reopening empty."""
+        db = Database(":memory:")
+        db.close()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            db.get_table_counts()
+
     def test_wal_mode_enabled(self):
         """Test that WAL mode is properly enabled."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -64,7 +105,7 @@ class TestDatabase:
                 "idx_apps_exe",
                 "idx_events_monitor_ts",
                 "idx_events_subject",
-                "idx_events_ts",
+                "idx_events_ts_id",
                 "idx_windows_app",
             ]
 
@@ -73,6 +114,36 @@ class TestDatabase:
 
             db.close()
 
+    def test_events_ts_index_replaced_on_upgrade(self):
+        """Test that opening a v6 database swaps idx_events_ts for idx_events_ts_id."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = Path(temp_dir) / "test.db"
+            db = Database(db_path)
+
+            # Roll the file back to a v6 layout with only the old ts index
+            with db._get_connection() as conn:
+                conn.execute("DROP INDEX idx_events_ts_id")
+                conn.execute("CREATE INDEX idx_events_ts ON events(ts_utc)")
+                conn.execute("UPDATE schema_version SET version = 6")
+                conn.commit()
+            db.close()
+
+            db = Database(db_path)
+            with db._get_connection() as conn:
+                version = conn.execute("SELECT version FROM schema_version").fetchone()
+                indexes = {
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type='index'"
+                    )
+                }
+
+            assert version[0] == 7
+            assert "idx_events_ts_id" in indexes
+            assert "idx_events_ts" not in indexes
+
+            db.close()
+
     def test_wal_checkpoint(self):
         """Test that WAL checkpoint operation works."""
         with tempfile.TemporaryDirectory() as temp_dir: